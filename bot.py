@@ -1,14 +1,16 @@
 import logging
-import threading
+import signal
 import asyncio
 from mizuki_editor.monitor.monitor import ChannelMonitor
-from mizuki_editor.main import handle_forwarded_message
+from mizuki_editor.monitor.session import SharedSession
+from supervisor import Supervisor, ProcessSupervisor
+from mizuki_editor.main import handle_forwarded_message, EditorWorkers
 from telegram.ext import Application, MessageHandler, filters, CommandHandler, ContextTypes
-from util import get_bot_token_2, get_admin_ids,get_bot_token
-from mizuki_editor.monitor.sync import sync_channel_files
+from util import get_bot_token_2, get_admin_ids,get_bot_token, DEPLOY_MODE
 from telegram import Update
 from typing import Optional
-from mizuki_editor.content_checker import ContentChecker
+from mizuki_editor.translation_cache import get_translation_cache
+from mizuki_editor.executor import shutdown_stages
 from mizuki_editor.limit.monitor import VideoMonitor
 from mizuki.start import get_start_handler
 from mizuki.upvote import get_upvote_handlers
@@ -27,9 +29,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Components that run on the shared user-session client
+TELETHON_COMPONENTS = {"ChannelMonitor", "VideoMonitor"}
+
 class BotRunner:
     def __init__(self):
         self.running = True
+        self.supervisor = None
+        self.session = None
+        self.channel_monitor = None
+        self.video_monitor = None
 
     async def error_handler(self, update: Optional[Update], context: ContextTypes.DEFAULT_TYPE):
         logger.error(f'Update {update} caused error: {context.error}', exc_info=context.error)
@@ -76,220 +85,186 @@ class BotRunner:
             return False
 
     async def run_mizuki_bot(self):
-        """Run the Mizuki Editor bot"""
-        restart_count = 0
-        max_restarts = 5
-        restart_delay = 10
-        
-        while restart_count < max_restarts and self.running:
-            application = None
-            monitor = None
-            monitor_task = None
-            sync_task = None
-            
-            try:
-                application = Application.builder() \
-                    .token(get_bot_token_2()) \
-                    .read_timeout(30) \
-                    .write_timeout(30) \
-                    .build()
-                
-                application.bot_data['content_checker'] = ContentChecker()
-                application.bot_data['admin_ids'] = get_admin_ids()
-                
-                sync_task = asyncio.create_task(sync_channel_files())
-                
-                monitor = ChannelMonitor()
-                monitor_task = asyncio.create_task(monitor.run())
-                
-                if not self.load_mizuki_handlers(application):
-                    logger.error("Failed to load one or more mizuki handlers")
-                    return
-                
-                admin_filter = filters.User(user_id=get_admin_ids())
-                application.add_handler(
-                    MessageHandler(
-                        admin_filter & 
-                        (filters.PHOTO | filters.VIDEO | filters.TEXT),
-                        handle_forwarded_message
-                    )
+        """Run the Mizuki Editor bot until it is stopped; the supervisor restarts it on failure"""
+        application = None
+        try:
+            application = Application.builder() \
+                .token(get_bot_token_2()) \
+                .read_timeout(30) \
+                .write_timeout(30) \
+                .build()
+
+            application.bot_data['editor_workers'] = EditorWorkers()
+            application.bot_data['admin_ids'] = get_admin_ids()
+
+            if not self.load_mizuki_handlers(application):
+                raise RuntimeError("Failed to load one or more mizuki handlers")
+
+            admin_filter = filters.User(user_id=get_admin_ids())
+            application.add_handler(
+                MessageHandler(
+                    admin_filter & 
+                    (filters.PHOTO | filters.VIDEO | filters.TEXT),
+                    handle_forwarded_message
                 )
-                
-                application.add_error_handler(self.error_handler)
-                
-                logger.info("Starting mizuki bot application...")
-                await application.initialize()
-                await application.start()
-                
-                await application.updater.start_polling()
-                logger.info("Mizuki bot polling started successfully")
-                
-                while self.running:
-                    await asyncio.sleep(5)
-                    if monitor_task.done():
-                        logger.error("Monitor task stopped unexpectedly!")
-                        raise RuntimeError("Monitor task stopped")
-                    if sync_task.done():
-                        logger.error("Sync task stopped unexpectedly!")
-                        raise RuntimeError("Sync task stopped")
-                    
-            except asyncio.CancelledError:
-                logger.info("Mizuki bot shutdown requested...")
-                break
-            except Exception as e:
-                logger.error(f"Mizuki bot fatal error: {e}", exc_info=True)
-                restart_count += 1
-                if restart_count < max_restarts and self.running:
-                    logger.info(f"Restarting mizuki bot in {restart_delay} seconds... (attempt {restart_count}/{max_restarts})")
-                    await asyncio.sleep(restart_delay)
-                else:
-                    logger.error("Max restart attempts reached for mizuki bot")
-                    break
-            finally:
-                logger.info("Cleaning up mizuki bot resources...")
-                try:
-                    if monitor:
-                        monitor.running = False
-                        await asyncio.sleep(0.5)
-                    
-                    if monitor_task:
-                        monitor_task.cancel()
-                        try:
-                            await monitor_task
-                        except asyncio.CancelledError:
-                            pass
-                    
-                    if sync_task:
-                        sync_task.cancel()
-                        try:
-                            await sync_task
-                        except asyncio.CancelledError:
-                            pass
-                    
-                    if application:
-                        try:
-                            await application.updater.stop()
-                        except Exception as e:
-                            logger.error(f"Error stopping mizuki updater: {e}")
-                        try:
-                            await application.stop()
-                        except Exception as e:
-                            logger.error(f"Error stopping mizuki application: {e}")
-                        try:
-                            await application.shutdown()
-                        except Exception as e:
-                            logger.error(f"Error shutting down mizuki application: {e}")
-                except Exception as e:
-                    logger.error(f"Error during mizuki bot shutdown: {e}")
+            )
+
+            application.add_error_handler(self.error_handler)
+
+            logger.info("Starting mizuki bot application...")
+            await application.initialize()
+            await application.start()
+
+            await application.updater.start_polling()
+            logger.info("Mizuki bot polling started successfully")
+
+            while self.running:
+                await asyncio.sleep(5)
+        finally:
+            logger.info("Cleaning up mizuki bot resources...")
+            if application:
+                await self._stop_application(application, "mizuki")
+            get_translation_cache().flush()
 
     async def run_ses_bot(self):
         """Run the SES Telegram bot"""
-        while self.running:
-            try:
-                application = Application.builder().token(get_bot_token()).build()
-                
-                application.add_handler(get_start_handler())
-                application.add_handlers(get_upvote_handlers())
-                application.add_handler(get_request_handler())
-                application.add_handler(get_approve_handler())
-                
-                await application.initialize()
-                await application.start()
-                logger.info("SES bot started...")
-                await application.updater.start_polling()
-                
-                while self.running:
-                    await asyncio.sleep(5)
-                    
-            except Exception as e:
-                logger.error(f"SES bot error: {e}", exc_info=True)
-                if self.running:
-                    logger.info("Restarting SES bot in 10 seconds...")
-                    await asyncio.sleep(10)
-            finally:
-                if application:
-                    try:
-                        await application.updater.stop()
-                        await application.stop()
-                        await application.shutdown()
-                    except Exception as e:
-                        logger.error(f"Error shutting down SES bot: {e}")
+        application = None
+        try:
+            application = Application.builder().token(get_bot_token()).build()
+
+            application.add_handler(get_start_handler())
+            application.add_handlers(get_upvote_handlers())
+            application.add_handler(get_request_handler())
+            application.add_handler(get_approve_handler())
+
+            await application.initialize()
+            await application.start()
+            logger.info("SES bot started...")
+            await application.updater.start_polling()
+
+            while self.running:
+                await asyncio.sleep(5)
+        finally:
+            if application:
+                await self._stop_application(application, "SES")
+
+    async def _stop_application(self, application, name):
+        workers = application.bot_data.get('editor_workers')
+        if workers is not None:
+            await workers.stop()
+            # The hash, translate and summarize pools only serve the editor workers
+            shutdown_stages()
+        try:
+            if application.updater.running:
+                await application.updater.stop()
+        except Exception as e:
+            logger.error(f"Error stopping {name} updater: {e}")
+        try:
+            if application.running:
+                await application.stop()
+        except Exception as e:
+            logger.error(f"Error stopping {name} application: {e}")
+        try:
+            await application.shutdown()
+        except Exception as e:
+            logger.error(f"Error shutting down {name} application: {e}")
 
     async def run_video_monitor(self):
-        """Run the video monitor"""
-        monitor = VideoMonitor()
-        while self.running:
-            try:
-                await monitor.start()
-            except Exception as e:
-                logger.error(f"Video monitor error: {e}", exc_info=True)
-                if self.running:
-                    logger.info("Restarting video monitor in 10 seconds...")
-                    await asyncio.sleep(10)
+        """Run the video monitor on the shared user session"""
+        client = await self.session.ready()
+        if self.video_monitor is None:
+            self.video_monitor = VideoMonitor(client)
+        await self.video_monitor.start()
 
     async def run_channel_monitor(self):
-        """Run the channel monitor"""
-        monitor = ChannelMonitor()
-        while self.running:
-            try:
-                await monitor.run()
-            except Exception as e:
-                logger.error(f"Channel monitor error: {e}", exc_info=True)
-                if self.running:
-                    logger.info("Restarting channel monitor in 10 seconds...")
-                    await asyncio.sleep(10)
-
-    def start_mizuki_bot(self):
-        asyncio.run(self.run_mizuki_bot())
-
-    def start_ses_bot(self):
-        asyncio.run(self.run_ses_bot())
-
-    def start_video_monitor(self):
-        asyncio.run(self.run_video_monitor())
-
-    def start_channel_monitor(self):
-        """Run the channel monitor in its own thread with proper event loop"""
-        def run_monitor():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+        """Run the channel monitor on the shared user session"""
+        client = await self.session.ready()
+        if self.channel_monitor is None:
+            self.channel_monitor = ChannelMonitor(client)
+        await self.channel_monitor.run()
+
+    def _components(self):
+        """Component name -> (factory, restart policy)"""
+        return {
+            "MizukiBot": (self.run_mizuki_bot, {'max_restarts': 5}),
+            "SESBot": (self.run_ses_bot, {}),
+            "ChannelMonitor": (self.run_channel_monitor, {}),
+            "VideoMonitor": (self.run_video_monitor, {}),
+        }
+
+    async def run(self, names=None):
+        """Run the named components (default: all) on one event loop around a single user-session client"""
+        supervisor = self.supervisor = Supervisor()
+        components = self._components()
+        names = names or list(components)
+        # Only the Telethon components need the user session; bot-only processes never log in
+        if TELETHON_COMPONENTS.intersection(names):
+            self.session = SharedSession()
+        for name in names:
+            factory, policy = components[name]
+            supervisor.add(name, factory, **policy)
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
             try:
-                loop.run_until_complete(self.run_channel_monitor())
-            finally:
-                loop.close()
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                pass
 
-        threading.Thread(target=run_monitor, name="ChannelMonitor").start()
+        try:
+            await supervisor.run()
+        finally:
+            if self.channel_monitor:
+                self.channel_monitor.running = False
+            if self.session is not None:
+                await self.session.close()
 
     def stop(self):
+        logger.info("Shutting down all bots...")
         self.running = False
+        if self.supervisor:
+            self.supervisor.stop()
+
+# In "processes" mode each group runs in its own process with its own event loop, so
+# hashing and video work in one cannot stall polling in another. The Telethon
+# components stay together so there is still one user-session client. Processes
+# share state only through files every writer replaces atomically and the
+# SQLite hash store; the channel monitor picks up source list edits by mtime.
+PROCESS_GROUPS = {
+    "mizuki": ["MizukiBot"],
+    "ses": ["SESBot"],
+    "userbot": ["ChannelMonitor", "VideoMonitor"],
+}
+
+
+async def run_mizuki_process():
+    await BotRunner().run(PROCESS_GROUPS["mizuki"])
+
+
+async def run_ses_process():
+    await BotRunner().run(PROCESS_GROUPS["ses"])
+
+
+async def run_userbot_process():
+    await BotRunner().run(PROCESS_GROUPS["userbot"])
+
 
 def main():
+    if DEPLOY_MODE == "processes":
+        supervisor = ProcessSupervisor()
+        supervisor.add("mizuki", run_mizuki_process)
+        supervisor.add("ses", run_ses_process)
+        supervisor.add("userbot", run_userbot_process)
+        supervisor.run()
+        logger.info("All bots stopped")
+        return
+
     bot_runner = BotRunner()
-    
     try:
-        threads = [
-            threading.Thread(target=bot_runner.start_mizuki_bot, name="MizukiBot"),
-            threading.Thread(target=bot_runner.start_ses_bot, name="SESBot"),
-            threading.Thread(target=bot_runner.start_video_monitor, name="VideoMonitor"),
-            threading.Thread(target=bot_runner.start_channel_monitor, name="ChannelMonitor")
-        ]
-        
-        for thread in threads:
-            thread.daemon = True
-            thread.start()
-        
-        for thread in threads:
-            thread.join()
-            
+        asyncio.run(bot_runner.run())
     except KeyboardInterrupt:
-        logger.info("Shutting down all bots...")
-        bot_runner.stop()
-        
-        for thread in threads:
-            if thread.is_alive():
-                thread.join(timeout=5)
-        
-        logger.info("All bots stopped")
+        pass
+    logger.info("All bots stopped")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
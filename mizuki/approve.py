@@ -2,7 +2,8 @@ import os
 import json
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
-from mizuki.config import get_admin_ids,REQ_FILE,TARGET_FILE
+from mizuki.config import get_admin_ids,REQ_FILE
+from util import atomic_write_json, add_target_channel
 
 async def approve_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
@@ -28,17 +29,11 @@ async def approve_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         group_id = requests[user_id]["group_id"]
 
-        with open(TARGET_FILE, 'r') as f:
-            forward_list = json.load(f)
-        
-        if group_id not in forward_list:
-            forward_list.append(group_id)
-            with open(TARGET_FILE, 'w') as f:
-                json.dump(forward_list, f, indent=2)
+        # Through the config registry, so the forwarders see the new target right away
+        add_target_channel(int(group_id))
         
         del requests[user_id]
-        with open(REQ_FILE, 'w') as f:
-            json.dump(requests, f, indent=2)
+        atomic_write_json(REQ_FILE, requests, indent=2)
         
         try:
             await context.bot.send_message(
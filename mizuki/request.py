@@ -2,7 +2,8 @@ import os
 import json
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
-from mizuki.config import get_admin_ids,REQ_FILE,TARGET_FILE
+from mizuki.config import get_admin_ids,REQ_FILE
+from util import atomic_write_json, load_target_channels
 
 async def request_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /request command from users with full validation"""
@@ -63,10 +64,7 @@ async def request_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         # 6. Check if already approved
-        with open(TARGET_FILE, 'r') as f:
-            forward_list = json.load(f)
-        
-        if group_id_int in forward_list:
+        if group_id_int in load_target_channels():
             await update.message.reply_text("✅ 𝗧𝗵𝗶𝘀 𝗴𝗿𝗼𝘂𝗽 𝗶𝘀 𝗮𝗹𝗿𝗲𝗮𝗱𝘆 𝗮𝗽𝗽𝗿𝗼𝘃𝗲𝗱!")
             return
 
@@ -86,8 +84,7 @@ async def request_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "group_type": chat.type
         }
         
-        with open(REQ_FILE, 'w') as f:
-            json.dump(requests, f, indent=2)
+        atomic_write_json(REQ_FILE, requests, indent=2)
 
         admins = get_admin_ids()
         notification_text = (
@@ -0,0 +1,109 @@
+import time
+import asyncio
+import inspect
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Album parts arrive as separate updates a few hundred ms apart
+GROUP_IDLE_TIMEOUT = 1.0
+GROUP_MAX_WAIT = 5.0
+GROUP_MAX_SIZE = 10
+GROUP_TTL = 60.0
+
+
+class _PendingGroup:
+    def __init__(self, now: float):
+        self.items: List[Any] = []
+        self.started = now
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MediaGroupAssembler:
+    """Collects the parts of media groups and hands each group on once it is complete.
+
+    A group is flushed when no new part has arrived for idle_timeout, when
+    max_wait has passed since its first part, or as soon as it holds
+    max_size parts (Telegram's album limit). on_complete(group_id, items)
+    is then called; if it returns an awaitable, that runs as a task. Groups
+    still open after ttl are dropped.
+    """
+
+    def __init__(self, on_complete: Callable[[Hashable, List[Any]], Union[Awaitable, None]], idle_timeout: float = GROUP_IDLE_TIMEOUT,
+                 max_wait: float = GROUP_MAX_WAIT, max_size: int = GROUP_MAX_SIZE, ttl: float = GROUP_TTL):
+        self.on_complete = on_complete
+        self.idle_timeout = idle_timeout
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self.ttl = ttl
+        self.groups: Dict[Hashable, _PendingGroup] = {}
+        # Recently flushed groups, so late parts can be told apart from new albums
+        self._flushed: Dict[Hashable, float] = {}
+        self._tasks = set()
+        self._cleanup_timer: Optional[asyncio.TimerHandle] = None
+
+    def __len__(self):
+        return len(self.groups)
+
+    def add(self, group_id: Hashable, item: Any):
+        """Add one part; must be called from the event loop"""
+        now = time.monotonic()
+        self._cleanup(now)
+        if group_id in self._flushed:
+            logger.warning(f"Late part for media group {group_id} arrived after it was flushed")
+
+        group = self.groups.get(group_id)
+        if group is None:
+            group = self.groups[group_id] = _PendingGroup(now)
+        group.items.append(item)
+
+        if len(group.items) >= self.max_size:
+            self._flush(group_id, "full")
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+        delay = min(self.idle_timeout, group.started + self.max_wait - now)
+        group.timer = asyncio.get_running_loop().call_later(max(0.0, delay), self._flush, group_id, "timeout")
+        self._schedule_cleanup()
+
+    def _flush(self, group_id: Hashable, reason: str):
+        group = self.groups.pop(group_id, None)
+        if group is None:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+        self._flushed[group_id] = time.monotonic()
+        waited = time.monotonic() - group.started
+        logger.debug(f"Media group {group_id} complete ({reason}): {len(group.items)} parts in {waited:.2f}s")
+        self._schedule_cleanup()
+        result = self.on_complete(group_id, group.items)
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            self._tasks.add(task)
+            task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error processing media group: {task.exception()}")
+
+    def _schedule_cleanup(self):
+        """Keep a TTL timer running while anything is tracked, so quiet periods still expire groups"""
+        if self._cleanup_timer is None and (self.groups or self._flushed):
+            self._cleanup_timer = asyncio.get_running_loop().call_later(self.ttl, self._run_cleanup)
+
+    def _run_cleanup(self):
+        self._cleanup_timer = None
+        self._cleanup(time.monotonic())
+        self._schedule_cleanup()
+
+    def _cleanup(self, now: float):
+        """Forget flushed ids and drop groups that outlived the TTL"""
+        for group_id in [g for g, flushed in self._flushed.items() if now - flushed > self.ttl]:
+            del self._flushed[group_id]
+        for group_id in [g for g, group in self.groups.items() if now - group.started > self.ttl]:
+            group = self.groups.pop(group_id)
+            if group.timer is not None:
+                group.timer.cancel()
+            logger.warning(f"Dropped stale media group {group_id} with {len(group.items)} parts")
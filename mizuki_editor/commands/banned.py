@@ -14,7 +14,7 @@ async def add_banned_word(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     words_to_add = context.args
-    banned_words = load_banned_words()
+    banned_words = list(load_banned_words())
     added_words = []
     
     for word in words_to_add:
@@ -37,7 +37,7 @@ async def remove_banned_word(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     words_to_remove = context.args
-    banned_words = load_banned_words()
+    banned_words = list(load_banned_words())
     removed_words = []
     
     for word in words_to_remove:
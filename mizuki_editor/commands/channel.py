@@ -1,7 +1,7 @@
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
 from mizuki_editor.commands.admin import admin_only
-from util import load_channels,save_channels
+from util import add_source_channel, remove_source_channels, load_channels
 
 @admin_only
 async def add_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -22,14 +22,10 @@ async def add_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Invalid channel ID. Must be a supergroup/channel ID (starts with -100)")
         return
     
-    channel_ids = load_channels()
-    
-    if channel_id_int in channel_ids:
+    if not add_source_channel(channel_id_int):
         await update.message.reply_text("ℹ️ Channel already in monitoring list")
         return
     
-    channel_ids.append(channel_id_int)
-    save_channels(channel_ids)
     await update.message.reply_text(f"✅ Channel added: {channel_id_int}")
 
 def get_add_channel_handler():
@@ -48,14 +44,11 @@ async def remove_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Invalid channel ID. Must be a number")
         return
     
-    channel_ids = load_channels()
-
-    if channel_id not in channel_ids:
+    if channel_id not in load_channels():
         await update.message.reply_text("ℹ️ Channel not in monitoring list")
         return
     
-    channel_ids.remove(channel_id)
-    save_channels(channel_ids)
+    remove_source_channels([channel_id])
     await update.message.reply_text(f"✅ Channel removed: {channel_id}")
 
 def get_remove_channel_handler():
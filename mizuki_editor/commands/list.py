@@ -1,10 +1,8 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
 from mizuki_editor.commands.admin import admin_only
-from util import load_banned_words, load_channels, load_remove_words, load_replace_words, TARGET_FILE, EMOJI_FILE, SYMBOL_FILE
-import json
+from util import load_banned_words, load_channels, load_remove_words, load_replace_words, load_emoji_replacements, load_preserve_symbols, load_target_channels
 import math
-import os
 
 ITEMS_PER_PAGE = 10
 
@@ -22,27 +20,6 @@ async def create_pagination_buttons(current_page: int, total_pages: int, prefix:
     
     return InlineKeyboardMarkup([buttons])
 
-def load_emoji_replacements():
-
-    if not os.path.exists(EMOJI_FILE):
-        return {}
-    try:
-        with open(EMOJI_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading emoji replacements: {e}")
-        return {}
-
-def load_preserve_symbols():
-
-    try:
-        if not os.path.exists(SYMBOL_FILE):
-            return []
-        with open(SYMBOL_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
-
 @admin_only
 async def list_banned(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
@@ -217,8 +194,7 @@ async def handle_list_callback(update: Update, context: ContextTypes.DEFAULT_TYP
 async def list_forward_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """List all forward groups with their links"""
     try:
-        with open(TARGET_FILE, 'r') as f:
-            forward_groups = json.load(f)
+        forward_groups = load_target_channels()
         
         if not forward_groups:
             await update.message.reply_text("No forward groups found.")
@@ -4,11 +4,11 @@ from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
 from mizuki_editor.commands.admin import admin_only
 import logging
-from util import JSON_FOLDER, SOURCE_FILE, REMOVE_FILE, REPLACE_FILE, BAN_FILE, HASH_FILE, SYMBOL_FILE, EMOJI_FILE, TARGET_FILE, RECOVERY_FILE
+from util import config, JSON_FOLDER, SOURCE_FILE, REMOVE_FILE, REPLACE_FILE, BAN_FILE, HASH_FILE, SYMBOL_FILE, EMOJI_FILE, TARGET_FILE, RECOVERY_FILE
 import psutil
 import time
 import asyncio
-import json
+from mizuki_editor.hash_store import open_hash_store
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +70,22 @@ async def reset_show(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(message)
 
+def _reset_file(file_name: str, bot_data=None):
+    """Write the default structure back to a JSON file"""
+    config.write(FILE_MAPPING[file_name], DEFAULT_STRUCTURES[file_name], indent=2)
+    if file_name == "hash":
+        # Hashes live in the hash store; hash.json is only its legacy source.
+        # Clear the live store so its cached count and the pHash indexes follow.
+        workers = (bot_data or {}).get('editor_workers')
+        if workers is not None:
+            workers.content_checker.processor.clear_hashes()
+            return
+        store = open_hash_store()
+        try:
+            store.clear()
+        finally:
+            store.close()
+
 @admin_only
 async def reset_json(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for reset commands"""
@@ -78,8 +94,7 @@ async def reset_json(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reset_count = 0
             for file_name, file_path in FILE_MAPPING.items():
                 try:
-                    with open(file_path, 'w') as f:
-                        json.dump(DEFAULT_STRUCTURES[file_name], f, indent=2)
+                    _reset_file(file_name, context.bot_data)
                     reset_count += 1
                 except Exception as e:
                     logger.error(f"Error resetting {file_name}: {e}")
@@ -95,8 +110,7 @@ async def reset_json(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         try:
-            with open(FILE_MAPPING[file_name], 'w') as f:
-                json.dump(DEFAULT_STRUCTURES[file_name], f, indent=2)
+            _reset_file(file_name, context.bot_data)
             await update.message.reply_text(f"✅ Reset {file_name} file to default")
         except Exception as e:
             await update.message.reply_text(f"⚠️ Error resetting {file_name}: {e}")
@@ -18,7 +18,7 @@ async def remove_remove_word_command(update: Update, context: ContextTypes.DEFAU
         return
 
     try:
-        words = load_remove_words()
+        words = list(load_remove_words())
         
         if word not in words:
             await update.message.reply_text(f"⚠️ '{word}' not found in removal list")
@@ -44,7 +44,7 @@ async def add_remove_word_command(update: Update, context: ContextTypes.DEFAULT_
         return
 
     try:
-        words = load_remove_words()
+        words = list(load_remove_words())
         
         if word in words:
             await update.message.reply_text(f"⚠️ '{word}' is already in the removal list")
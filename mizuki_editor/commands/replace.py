@@ -13,7 +13,7 @@ async def add_replace(update: Update, context: ContextTypes.DEFAULT_TYPE):
     original = context.args[0]
     replacement = context.args[1]
     
-    replace_words = load_replace_words()
+    replace_words = dict(load_replace_words())
     replace_words[original] = replacement
     save_replace_words(replace_words)
     
@@ -27,7 +27,7 @@ async def remove_replace(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     original = context.args[0]
-    replace_words = load_replace_words()
+    replace_words = dict(load_replace_words())
     
     if original in replace_words:
         del replace_words[original]
@@ -1,30 +1,7 @@
 from mizuki_editor.commands.admin import admin_only
-import json
-import os
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
-from util import EMOJI_FILE
-
-def load_emoji_replacements():
-    """Load emoji replacements from JSON file"""
-    if not os.path.exists(EMOJI_FILE):
-        return {}
-    try:
-        with open(EMOJI_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading emoji replacements: {e}")
-        return {}
-
-def save_emoji_replacements(data):
-    """Save emoji replacements to JSON file"""
-    try:
-        with open(EMOJI_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"Error saving emoji replacements: {e}")
-        return False
+from util import load_emoji_replacements, save_emoji_replacements
 
 @admin_only
 async def add_emoji_replacement(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -36,7 +13,7 @@ async def add_emoji_replacement(update: Update, context: ContextTypes.DEFAULT_TY
     emoji = context.args[0]
     replacement = ' '.join(context.args[1:])
     
-    replacements = load_emoji_replacements()
+    replacements = dict(load_emoji_replacements())
     replacements[emoji] = replacement
     
     if save_emoji_replacements(replacements):
@@ -52,7 +29,7 @@ async def remove_emoji_replacement(update: Update, context: ContextTypes.DEFAULT
         return
 
     emoji = context.args[0]
-    replacements = load_emoji_replacements()
+    replacements = dict(load_emoji_replacements())
     
     if emoji in replacements:
         del replacements[emoji]
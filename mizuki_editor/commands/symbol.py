@@ -1,29 +1,8 @@
-import json
-import os
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
-from util import SYMBOL_FILE
+from util import load_preserve_symbols, save_preserve_symbols
 from mizuki_editor.commands.admin import admin_only
 
-def load_preserve_symbols():
-    """Load symbols to preserve during emoji removal"""
-    try:
-        if not os.path.exists(SYMBOL_FILE):
-            return []
-        with open(SYMBOL_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
-
-def save_preserve_symbols(symbols):
-    """Save symbols to preserve during emoji removal"""
-    try:
-        with open(SYMBOL_FILE, 'w', encoding='utf-8') as f:
-            json.dump(symbols, f, ensure_ascii=False, indent=2)
-        return True
-    except:
-        return False
-
 @admin_only
 async def add_symbol(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add new symbol to preserve (/as command)"""
@@ -32,7 +11,7 @@ async def add_symbol(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
         
     symbol = context.args[0]
-    symbols = load_preserve_symbols()
+    symbols = list(load_preserve_symbols())
     
     if symbol in symbols:
         await update.message.reply_text("Symbol already exists in preserve list.")
@@ -52,7 +31,7 @@ async def remove_symbol(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
         
     symbol = context.args[0]
-    symbols = load_preserve_symbols()
+    symbols = list(load_preserve_symbols())
     
     if symbol not in symbols:
         await update.message.reply_text("Symbol not found in preserve list.")
@@ -1,42 +1,44 @@
 import logging
 import asyncio
-from typing import List, Dict, Optional, Union
-from collections import defaultdict
+from typing import Callable, List, Dict, Optional, Union
 from telegram import Bot, InputMediaPhoto, InputMediaVideo, Message
 from telegram.constants import ParseMode
-from util import get_target_channel, get_bot_token_2, load_banned_words, get_dump_channel_id,get_vid_channel_id
+from util import get_target_channel, get_bot_token_2, load_banned_words, get_dump_channel_id,get_vid_channel_id, MEDIA_GROUP_FANOUT
 from mizuki_editor.hash import _load_hash_data
 from mizuki_editor.processor import Processor
 from mizuki_editor.editor import Editor
+from mizuki_editor.rules import BannedWordCache
+from mizuki_editor.dispatch import get_dispatcher, get_bot_api_limiter
+from mizuki_editor.forward import build_media_group
+from mizuki_editor.assembler import MediaGroupAssembler
 
 logger = logging.getLogger(__name__)
 
 class ContentChecker:
-    def __init__(self):
+    def __init__(self, on_group_complete: Optional[Callable[[str, List[Message]], None]] = None):
         self.hash_data = _load_hash_data()
         self.banned_words = load_banned_words()
-        self.media_group_cache = defaultdict(list)
+        self.banned_matcher = BannedWordCache()
+        # Completed groups go to on_group_complete (e.g. back to a worker shard), else run as tasks
+        self.media_groups = MediaGroupAssembler(on_group_complete or self.process_media_group)
+        self.hash_lock = asyncio.Lock()
         self.bot = Bot(token=get_bot_token_2())
-        self.processor = Processor(self.hash_data, self.banned_words, self)
         self.editor = Editor()
+        self.processor = Processor(self.hash_data, self.banned_words, self)
         self.dump_channel = get_dump_channel_id()
         self.vid_channel = get_vid_channel_id()
     
     def _contains_banned_words(self, text: str) -> bool:
         """Check if text contains any banned words"""
-        if not text or not self.banned_words:
+        if not text:
             return False
-            
-        text_lower = text.lower()
-        return any(word.lower() in text_lower for word in self.banned_words)
+        return self.banned_matcher.get().contains_any(text)
 
     async def process_message(self, message: Message) -> Optional[Union[List[Dict], str]]:
         """Process a single message or add to media group cache"""
         if message.media_group_id:
        
-            self.media_group_cache[message.media_group_id].append(message)
-            if len(self.media_group_cache[message.media_group_id]) == 1:
-                asyncio.create_task(self._process_complete_media_group(message.media_group_id))
+            self.media_groups.add(message.media_group_id, message)
             return None
         return await self._process_single_message(message)
 
@@ -63,25 +65,34 @@ class ContentChecker:
         if not media_hashes and message.text:
             return processed_caption
         
-        valid_files = []
-        for media in media_hashes:
-            if not await self.processor._check_duplicates([media]):
-                media['processed_caption'] = processed_caption
-                valid_files.append(media)
-        
-        if not valid_files:
-            logger.info("No valid files after duplicate check")
-            return None
-        
-        await self.processor._add_to_hash_data(self.hash_data, processed_caption, valid_files)
+        # Check and record under one lock so two workers cannot both accept the same media
+        async with self.hash_lock:
+            valid_files = []
+            for media in media_hashes:
+                if not await self.processor._check_duplicates([media]):
+                    media['processed_caption'] = processed_caption
+                    valid_files.append(media)
+            
+            if not valid_files:
+                logger.info("No valid files after duplicate check")
+                return None
+            
+            await self.processor._add_to_hash_data(self.hash_data, processed_caption, valid_files)
         
         return valid_files
 
-    async def _process_complete_media_group(self, group_id: str):
+    async def _generate_group_hashes(self, messages: List[Message]) -> List[List[Dict]]:
+        """Download and hash every part of an album concurrently, in message order"""
+        semaphore = asyncio.Semaphore(MEDIA_GROUP_FANOUT)
+
+        async def hash_one(msg):
+            async with semaphore:
+                return await self.processor._generate_media_hashes(msg)
+
+        return await asyncio.gather(*(hash_one(msg) for msg in messages))
+
+    async def process_media_group(self, group_id: str, messages: List[Message]):
         """Process a complete media group after all parts are received"""
-        await asyncio.sleep(2) 
-        
-        messages = self.media_group_cache.pop(group_id, [])
         if not messages:
             return
 
@@ -96,8 +107,7 @@ class ContentChecker:
         
         media_list = []
         large_media_files = []
-        for msg in messages:
-            media_hashes = await self.processor._generate_media_hashes(msg)
+        for media_hashes in await self._generate_group_hashes(messages):
             for media in media_hashes:
                 if media.get('skipped'):
                     large_media_files.append(media)
@@ -121,16 +131,15 @@ class ContentChecker:
             logger.info("No non-large media left in the group")
             return
         
-        valid_files = []
-        for media in media_list:
-            if not await self.processor._check_duplicates([media]):
+        async with self.hash_lock:
+            valid_files = await self.processor._filter_duplicates(media_list)
+            for media in valid_files:
                 media['processed_caption'] = processed_caption
-                valid_files.append(media)
-        
-        if not valid_files:
-            logger.info("All non-large media in group are duplicates - skipping")
-            return
-        await self.processor._add_to_hash_data(self.hash_data, processed_caption, valid_files)
+            
+            if not valid_files:
+                logger.info("All non-large media in group are duplicates - skipping")
+                return
+            await self.processor._add_to_hash_data(self.hash_data, processed_caption, valid_files)
         
         await self.forward_media_group(valid_files, processed_caption)
 
@@ -141,37 +150,13 @@ class ContentChecker:
             logger.warning("No target channels configured")
             return
 
-        for target_id in target_ids:
-            try:
-                media_group = []
-                for i, item in enumerate(media_list):
-                    if item['type'] == 'photo':
-                        media_type = InputMediaPhoto
-                    elif item['type'] in ['video', 'document']:
-                        media_type = InputMediaVideo
-                    else:
-                        continue
-                    
-                    if i == 0:
-                        media_caption = caption
-                        parse_mode = ParseMode.MARKDOWN_V2
-                    else:
-                        media_caption = None
-                        parse_mode = None
-                    
-                    media_group.append(media_type(
-                        media=item['file_id'],
-                        caption=media_caption,
-                        parse_mode=parse_mode
-                    ))
-                
-                await self.bot.send_media_group(
-                    chat_id=target_id,
-                    media=media_group
-                )
-                logger.info(f"Successfully forwarded media group with {len(media_list)} items to channel {target_id}")
-            except Exception as e:
-                logger.error(f"Failed to forward media group to channel {target_id}: {e}")
+        media_group = build_media_group(media_list, caption)
+
+        async def send(target_id):
+            await self.bot.send_media_group(chat_id=target_id, media=media_group)
+
+        logger.info(f"Forwarding media group with {len(media_list)} items to {len(target_ids)} channels")
+        return await get_dispatcher().send_to_all(target_ids, send, cost=len(media_group))
     
     async def forward_to_dump_channel(self, messages: List[Message], caption: str):
         """Forward messages to dump channel with formatted caption"""
@@ -180,6 +165,7 @@ class ContentChecker:
             return
             
         try:
+            await get_bot_api_limiter().acquire(len(messages))
             if len(messages) == 1:
                 msg = messages[0]
                 if msg.text:
@@ -252,6 +238,7 @@ class ContentChecker:
             return
             
         try:
+            await get_bot_api_limiter().acquire(len(messages))
             if len(messages) == 1:
                 msg = messages[0]
                 if msg.text:
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Awaitable, Callable, Iterable, List, Optional
+from telegram.error import NetworkError, RetryAfter, TimedOut
+from mizuki_editor.ratelimit import KeyedRateLimiter, RateLimiter, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Bot API limits: ~30 messages/s overall and 20 messages/min into one group or channel
+MAX_CONCURRENT_SENDS = 8
+GLOBAL_SEND_RATE = 25
+PER_CHAT_SEND_RATE = 20 / 60
+PER_CHAT_BURST = 3
+MAX_SEND_ATTEMPTS = 3
+
+
+@dataclass
+class DeliveryResult:
+    chat_id: int
+    ok: bool
+    attempts: int
+    error: Optional[str] = None
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class FanoutDispatcher:
+    """Sends one post to many chats concurrently under global and per-chat limits"""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENT_SENDS, global_limiter: Optional[RateLimiter] = None,
+                 per_chat_rate: float = PER_CHAT_SEND_RATE, per_chat_burst: float = PER_CHAT_BURST,
+                 max_attempts: int = MAX_SEND_ATTEMPTS):
+        self.max_concurrency = max_concurrency
+        self.global_limiter = global_limiter or get_bot_api_limiter()
+        # Per-chat limiters are waited on before a send slot is taken, so a
+        # throttled chat does not hold a slot the others could use; the
+        # global limiter is checked once the slot is ours.
+        self.chat_limiters = KeyedRateLimiter(per_chat_rate, 1, burst=per_chat_burst)
+        self.max_attempts = max_attempts
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _deliver(self, chat_id: int, send: Callable[[int], Awaitable], cost: int) -> DeliveryResult:
+        limiter = self.chat_limiters.get(chat_id)
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            await limiter.acquire(cost)
+            async with self._semaphore:
+                await self.global_limiter.acquire(cost)
+                try:
+                    await send(chat_id)
+                    return DeliveryResult(chat_id, True, attempt)
+                except RetryAfter as e:
+                    wait = _retry_after_seconds(e)
+                    logger.warning(f"Flood control for chat {chat_id}: retry in {wait:.0f}s")
+                    limiter.pause(wait)
+                    error = str(e)
+                except TimedOut as e:
+                    # The message may already be posted; retrying could duplicate it
+                    return DeliveryResult(chat_id, False, attempt, str(e))
+                except NetworkError as e:
+                    logger.warning(f"Network error sending to {chat_id} (attempt {attempt}): {e}")
+                    limiter.pause(2 ** attempt)
+                    error = str(e)
+                except Exception as e:
+                    return DeliveryResult(chat_id, False, attempt, str(e))
+        return DeliveryResult(chat_id, False, self.max_attempts, error)
+
+    async def send_to_all(self, chat_ids: Iterable[int], send: Callable[[int], Awaitable],
+                          cost: int = 1) -> List[DeliveryResult]:
+        """Call send(chat_id) for every chat concurrently and report each outcome"""
+        chat_ids = list(chat_ids)
+        results = await asyncio.gather(*(self._deliver(chat_id, send, cost) for chat_id in chat_ids))
+        failed = [r for r in results if not r.ok]
+        for result in failed:
+            logger.error(f"Failed to forward to channel {result.chat_id} "
+                         f"after {result.attempts} attempt(s): {result.error}")
+        logger.info(f"Delivered to {len(results) - len(failed)}/{len(results)} target channels")
+        return results
+
+
+def get_bot_api_limiter() -> RateLimiter:
+    """Overall Bot API send budget, shared by every sender of the editor bot"""
+    return get_rate_limiter('bot_api', GLOBAL_SEND_RATE, 1)
+
+
+_dispatcher: Optional[FanoutDispatcher] = None
+
+
+def get_dispatcher() -> FanoutDispatcher:
+    """The dispatcher shared by every sender of the editor bot"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = FanoutDispatcher()
+    return _dispatcher
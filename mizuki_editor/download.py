@@ -0,0 +1,123 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+import httpx
+from util import VIDEO_HASH_CHUNK_SIZE, DOWNLOAD_MEMORY_BUDGET
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+class ByteBudget:
+    """Caps the bytes held by in-flight downloads; a reservation waits until it fits"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @asynccontextmanager
+    async def reserve(self, size: int):
+        # A file larger than the whole budget still goes through, on its own
+        size = min(size, self.limit)
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.used -= size
+                self._condition.notify_all()
+
+
+download_budget = ByteBudget(DOWNLOAD_MEMORY_BUDGET)
+
+
+class FileSizeExceeded(ValueError):
+    """The download outgrew the file_size Telegram reported for it"""
+
+
+def _get_client() -> httpx.AsyncClient:
+    """One pooled HTTP client for every file download"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0), follow_redirects=True)
+    return _client
+
+
+async def download_range(file, start: int, end: int, chunk_size: int = VIDEO_HASH_CHUNK_SIZE) -> bytes:
+    """Bytes [start, end) of a Telegram file, streamed with an HTTP range request.
+
+    `file` is a telegram.File; with a local Bot API server its file_path is
+    a path on disk and is read directly.
+    """
+    if end <= start:
+        return b''
+    path = file.file_path
+    if path and os.path.isfile(path):
+        with open(path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    buffer = bytearray()
+    headers = {'Range': f'bytes={start}-{end - 1}'}
+    async with _get_client().stream('GET', path, headers=headers) as response:
+        response.raise_for_status()
+        # A server that ignores Range answers 200 with the whole file
+        skip = start if response.status_code == 200 else 0
+        async for chunk in response.aiter_bytes(chunk_size):
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk[skip:]
+                skip = 0
+            buffer.extend(chunk)
+            if len(buffer) >= end - start:
+                break
+    return bytes(buffer[:end - start])
+
+
+async def download_into(file, buffer: memoryview, on_chunk: Optional[Callable[[memoryview], None]] = None,
+                        chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> int:
+    """Stream a Telegram file into a preallocated buffer, returning the bytes written.
+
+    on_chunk sees each chunk as a view of the buffer, so digests can be fed
+    while the download is still running without another copy of the file.
+    """
+    written = 0
+
+    def accept(chunk):
+        nonlocal written
+        end = written + len(chunk)
+        if end > len(buffer):
+            raise FileSizeExceeded(f"File is larger than its reported size of {len(buffer)} bytes")
+        buffer[written:end] = chunk
+        if on_chunk is not None:
+            with buffer[written:end] as part:
+                on_chunk(part)
+        written = end
+
+    path = file.file_path
+    if path and os.path.isfile(path):
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                accept(chunk)
+        return written
+
+    async with _get_client().stream('GET', path) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes(chunk_size):
+            accept(chunk)
+    return written
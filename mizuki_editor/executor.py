@@ -0,0 +1,91 @@
+import atexit
+import asyncio
+import logging
+import weakref
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_stages: "weakref.WeakSet[StageExecutor]" = weakref.WeakSet()
+
+
+class StageExecutor:
+    """Runs a blocking pipeline stage on a bounded thread or process pool.
+
+    At most max_pending calls are in flight; further callers wait on the
+    event loop instead of piling work into the pool. A timeout only stops
+    the caller from waiting, the pool worker still finishes its call, and
+    that call keeps its slot until it does.
+    """
+
+    def __init__(self, name: str, kind: str = 'thread', max_workers: int = 2,
+                 max_pending: Optional[int] = None, timeout: Optional[float] = None):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown pool kind for {name}: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max_workers * 2
+        self.timeout = timeout
+        self._pool: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        _stages.add(self)
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == 'process':
+                # spawn keeps the child clear of the parent's threads and event loops
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name)
+            logger.info(f"Started {self.kind} pool for {self.name} ({self.max_workers} workers)")
+        return self._pool
+
+    async def run(self, func, *args, timeout: Optional[float] = None):
+        """Run func(*args) in the pool; raises asyncio.TimeoutError after timeout seconds"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        timeout = timeout if timeout is not None else self.timeout
+        semaphore = self._semaphore
+        await semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_pool().submit(func, *args)
+        except BaseException:
+            semaphore.release()
+            raise
+        # Release when the pool is done with the call, not when the caller gives up on it
+        future.add_done_callback(lambda _: _release(loop, semaphore))
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    def shutdown(self, wait: bool = False, cancel_futures: bool = True):
+        if self._pool is None:
+            return
+        pool, self._pool = self._pool, None
+        self._semaphore = None
+        pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+        if not wait and self.kind == 'process':
+            # A hung worker would otherwise block interpreter exit joining the pool
+            for process in list((getattr(pool, '_processes', None) or {}).values()):
+                process.terminate()
+        logger.info(f"Stopped {self.kind} pool for {self.name}")
+
+
+def _release(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore):
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        # The loop is closed; nothing is waiting on the semaphore any more
+        pass
+
+
+@atexit.register
+def shutdown_stages():
+    """Stop every stage pool without waiting for calls still in progress"""
+    for stage in list(_stages):
+        stage.shutdown(wait=False, cancel_futures=True)
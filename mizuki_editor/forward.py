@@ -3,66 +3,74 @@ from telegram import InputMediaPhoto, InputMediaVideo
 from telegram.constants import ParseMode
 from typing import List, Dict
 from util import get_target_channel
+from mizuki_editor.dispatch import get_dispatcher, DeliveryResult
 
 logger = logging.getLogger(__name__)
 
+def build_media_group(media: List[Dict], caption: str = None):
+    """InputMedia list for send_media_group, caption on the first item"""
+    media_group = []
+    for i, item in enumerate(media):
+        if item["type"] == "photo":
+            media_type = InputMediaPhoto
+        elif item["type"] in ["video", "document"]:
+            media_type = InputMediaVideo
+        else:
+            continue
+        item_caption = (caption if caption is not None else item.get("processed_caption")) if i == 0 else None
+        parse_mode = ParseMode.MARKDOWN_V2 if item_caption else None
+
+        media_group.append(
+            media_type(
+                media=item["file_id"],
+                caption=item_caption,
+                parse_mode=parse_mode,
+            )
+        )
+    return media_group
+
+async def send_to_target(bot, target_id: int, text: str = None, media: List[Dict] = None):
+    """Send text or media to a single target channel"""
+    if text:
+        await bot.send_message(
+            chat_id=target_id, text=text, parse_mode=ParseMode.MARKDOWN_V2
+        )
+    elif media:
+        if len(media) == 1:
+            item = media[0]
+            caption = item.get("processed_caption")
+            parse_mode = ParseMode.MARKDOWN_V2 if caption else None
+
+            if item["type"] == "photo":
+                await bot.send_photo(
+                    chat_id=target_id,
+                    photo=item["file_id"],
+                    caption=caption,
+                    parse_mode=parse_mode,
+                )
+            elif item["type"] in ["video", "document"]:
+                await bot.send_video(
+                    chat_id=target_id,
+                    video=item["file_id"],
+                    caption=caption,
+                    parse_mode=parse_mode,
+                )
+        else:
+            await bot.send_media_group(
+                chat_id=target_id, media=build_media_group(media)
+            )
+
 async def forward_to_all_targets(
     context, text: str = None, media: List[Dict] = None
-):
+) -> List[DeliveryResult]:
     """Forward content to all target channels"""
     target_ids = get_target_channel()
     if not target_ids:
         logger.warning("No target channels configured")
-        return
-
-    for target_id in target_ids:
-        try:
-            if text:
-                await context.bot.send_message(
-                    chat_id=target_id, text=text, parse_mode=ParseMode.MARKDOWN_V2
-                )
-            elif media:
-                if len(media) == 1:
-                    item = media[0]
-                    caption = item.get("processed_caption")
-                    parse_mode = ParseMode.MARKDOWN_V2 if caption else None
-
-                    if item["type"] == "photo":
-                        await context.bot.send_photo(
-                            chat_id=target_id,
-                            photo=item["file_id"],
-                            caption=caption,
-                            parse_mode=parse_mode,
-                        )
-                    elif item["type"] in ["video", "document"]:
-                        await context.bot.send_video(
-                            chat_id=target_id,
-                            video=item["file_id"],
-                            caption=caption,
-                            parse_mode=parse_mode,
-                        )
-                else:
-                    media_group = []
-                    for i, item in enumerate(media):
-                        if item["type"] == "photo":
-                            media_type = InputMediaPhoto
-                        elif item["type"] in ["video", "document"]:
-                            media_type = InputMediaVideo
-                        else:
-                            continue
-                        caption = item.get("processed_caption") if i == 0 else None
-                        parse_mode = ParseMode.MARKDOWN_V2 if caption else None
+        return []
 
-                        media_group.append(
-                            media_type(
-                                media=item["file_id"],
-                                caption=caption,
-                                parse_mode=parse_mode,
-                            )
-                        )
+    async def send(target_id):
+        await send_to_target(context.bot, target_id, text=text, media=media)
 
-                    await context.bot.send_media_group(
-                        chat_id=target_id, media=media_group
-                    )
-        except Exception as e:
-            logger.error(f"Failed to forward to channel {target_id}: {e}")
\ No newline at end of file
+    cost = len(media) if media and not text else 1
+    return await get_dispatcher().send_to_all(target_ids, send, cost=cost)
@@ -0,0 +1,95 @@
+import logging
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class HammingIndex:
+    """Near-duplicate lookup for fixed-width hashes (e.g. 64-bit pHash).
+
+    Multi-index hashing: each hash is cut into threshold + 1 blocks and each
+    block value is indexed on its own. Two hashes within `threshold` bits
+    must agree exactly on at least one block, so a search only compares
+    against the hashes that share a block instead of scanning everything.
+    """
+
+    def __init__(self, threshold: int, bits: int = 64):
+        self.threshold = max(0, threshold)
+        self.bits = bits
+        blocks = min(self.threshold + 1, bits)
+        widths = [bits // blocks + (1 if i < bits % blocks else 0) for i in range(blocks)]
+        self._blocks: List[Tuple[int, int]] = []
+        shift = 0
+        for width in widths:
+            self._blocks.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables: List[Dict[int, Set[Hashable]]] = [defaultdict(set) for _ in self._blocks]
+        self.hashes: Dict[Hashable, int] = {}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, key):
+        return key in self.hashes
+
+    @staticmethod
+    def parse(value) -> int:
+        return value if isinstance(value, int) else int(value, 16)
+
+    def add(self, key: Hashable, value):
+        if key in self.hashes:
+            self.remove(key)
+        value = self.parse(value)
+        self.hashes[key] = value
+        for table, (shift, mask) in zip(self._tables, self._blocks):
+            table[(value >> shift) & mask].add(key)
+
+    def remove(self, key: Hashable):
+        value = self.hashes.pop(key, None)
+        if value is None:
+            return
+        for table, (shift, mask) in zip(self._tables, self._blocks):
+            block = (value >> shift) & mask
+            bucket = table.get(block)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del table[block]
+
+    def clear(self):
+        for table in self._tables:
+            table.clear()
+        self.hashes.clear()
+
+    def _candidates(self, value: int):
+        seen = set()
+        for table, (shift, mask) in zip(self._tables, self._blocks):
+            for key in table.get((value >> shift) & mask, ()):
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def search(self, value, threshold: Optional[int] = None) -> Optional[Tuple[Hashable, int]]:
+        """Closest stored (key, distance) within the threshold, or None"""
+        threshold = self.threshold if threshold is None else min(threshold, self.threshold)
+        value = self.parse(value)
+        best = None
+        for key in self._candidates(value):
+            distance = (value ^ self.hashes[key]).bit_count()
+            if distance <= threshold and (best is None or distance < best[1]):
+                best = (key, distance)
+                if distance == 0:
+                    break
+        return best
+
+    def search_all(self, value, threshold: Optional[int] = None) -> List[Tuple[Hashable, int]]:
+        """Every stored (key, distance) within the threshold"""
+        threshold = self.threshold if threshold is None else min(threshold, self.threshold)
+        value = self.parse(value)
+        matches = []
+        for key in self._candidates(value):
+            distance = (value ^ self.hashes[key]).bit_count()
+            if distance <= threshold:
+                matches.append((key, distance))
+        return matches
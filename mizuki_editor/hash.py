@@ -1,67 +1,16 @@
-import hashlib
-import os
-import json
 import time
 import logging
-from moviepy import VideoFileClip
-from PIL import Image
 from typing import List,Dict
-import imagehash
-import io
 from telegram import Message
-from util import MAX_HASH_ENTRIES, HASH_FILE
+from mizuki_editor.hash_store import HashStore, open_hash_store
+from mizuki_editor.video_fingerprint import fingerprint_telegram_video
+from mizuki_editor.media_hasher import media_hasher
 
 logger = logging.getLogger(__name__)
 
-def compute_video_hashes(video_path: str) -> Dict[str, str]:
-    """
-    Compute MD5 and SHA256 hashes of video frames (first 10 seconds at 2 FPS).
-    Returns a dictionary with 'md5' and 'sha256' hex digests.
-    """
-    try:
-        clip = VideoFileClip(video_path)
-        end_time = min(10, clip.duration)
-
-        md5_hash = hashlib.md5()
-        sha256_hash = hashlib.sha256()
-
-        for t, img in clip.iter_frames(fps=2, with_times=True):
-            if t > end_time:
-                break
-
-            frame_bytes = img.tobytes()
-            md5_hash.update(frame_bytes)
-            sha256_hash.update(frame_bytes)
-
-        clip.close()
-        return {
-            'md5': md5_hash.hexdigest(),
-            'sha256': sha256_hash.hexdigest()
-        }
-
-    except Exception as e:
-        logger.error(f"Error computing video hashes: {e}")
-        return {'md5': '', 'sha256': ''}
-
-
-def _load_hash_data():
-    """Load hash data from JSON file"""
-    hash_data = {}
-    try:
-        if os.path.exists(HASH_FILE):
-            with open(HASH_FILE, 'r') as f:
-                hash_data = json.load(f)
-    except Exception as e:
-        logger.error(f"Error loading hash data: {e}")
-    return hash_data
-
-def _save_hash_data(hash_data):
-    """Save hash data to JSON file"""
-    try:
-        with open(HASH_FILE, 'w') as f:
-            json.dump(hash_data, f, indent=2)
-    except Exception as e:
-        logger.error(f"Error saving hash data: {e}")
+def _load_hash_data() -> HashStore:
+    """Open the hash store, migrating hash.json on first use"""
+    return open_hash_store()
 
 async def _generate_media_hashes(message: Message) -> List[Dict]:
     """Generate hashes for media content with 20MB size limit"""
@@ -83,14 +32,12 @@ async def _generate_media_hashes(message: Message) -> List[Dict]:
                 logger.warning(f"Skipping large photo ({file.file_size/1_000_000:.1f}MB)")
                 return [{'type': 'photo', 'skipped': True, 'file_id': largest_photo.file_id}]
                 
-            file_bytes = await file.download_as_bytearray()
-            
-            image = Image.open(io.BytesIO(file_bytes))
+            digests = await media_hasher.hash_telegram_file(file)
             media_hashes.append({
                 'type': 'photo',
-                'phash': str(imagehash.phash(image)),
-                'sha256': hashlib.sha256(file_bytes).hexdigest(),
-                'md5': hashlib.md5(file_bytes).hexdigest(),
+                'phash': digests['phash'],
+                'sha256': digests['sha256'],
+                'md5': digests['md5'],
                 'file_id': largest_photo.file_id
             })
         except Exception as e:
@@ -111,27 +58,25 @@ async def _generate_media_hashes(message: Message) -> List[Dict]:
                 logger.warning(f"Skipping large video ({file.file_size/1_000_000:.1f}MB)")
                 return [{'type': 'video', 'skipped': True, 'file_id': video.file_id}]
                 
-            file_path = await file.download_to_drive()
-            
-            video_hashes = compute_video_hashes(file_path)
+            video_hashes = await fingerprint_telegram_video(file)
             
             media_hashes.append({
                 'type': 'video',
                 'sha256': video_hashes['sha256'],
                 'md5': video_hashes['md5'],
+                'frames': video_hashes['frames'],
                 'file_id': video.file_id
             })
-            
-            os.remove(file_path)
         except Exception as e:
             logger.error(f"Error processing video: {e}")
     
     return media_hashes
 
-async def _add_to_hash_data(hash_data, caption: str, media_hashes: List[Dict]):
-    """Add new media hashes to the hash database"""
+async def _add_to_hash_data(hash_data: HashStore, caption: str, media_hashes: List[Dict]) -> List[str]:
+    """Add new media hashes to the hash database, returning the evicted keys"""
     try:
-        media_keys = []
+        entries = {}
+        timestamp = int(time.time())
         for media in media_hashes:
             if media.get('skipped'):
                 continue
@@ -141,18 +86,13 @@ async def _add_to_hash_data(hash_data, caption: str, media_hashes: List[Dict]):
             else:
                 key = media['sha256']
 
-            media_keys.append(key)
-            hash_data[key] = {
+            entries[key] = {
                 'caption': caption,
                 'media': media,
-                'timestamp': int(time.time())
+                'timestamp': timestamp
             }
         
-        while len(hash_data) > MAX_HASH_ENTRIES:
-            oldest_key = min(hash_data, key=lambda k: hash_data[k]['timestamp'])
-            hash_data.pop(oldest_key)
-            logger.info(f"Removed oldest hash entry to maintain size limit")
-        
-        _save_hash_data(hash_data)
+        return hash_data.add(entries)
     except Exception as e:
-        logger.error(f"Error adding to hash data: {e}")
\ No newline at end of file
+        logger.error(f"Error adding to hash data: {e}")
+        return []
\ No newline at end of file
@@ -0,0 +1,246 @@
+import os
+import json
+import heapq
+import sqlite3
+import logging
+import itertools
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from util import HASH_FILE, HASH_DB_FILE, HASH_STORE_BACKEND, MAX_HASH_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+
+class HashStore(ABC):
+    """Media hashes already posted, keyed by pHash (photos) or sha256 (videos).
+
+    Entries are {'caption', 'media', 'timestamp'} dicts; once the store holds
+    more than max_entries, the oldest are evicted.
+    """
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        ...
+
+    def contains_many(self, keys: Iterable[str]) -> Set[str]:
+        """The subset of keys already stored"""
+        return {key for key in keys if key in self}
+
+    @abstractmethod
+    def add(self, entries: Dict[str, Dict]) -> List[str]:
+        """Insert or refresh entries, returning the keys evicted to stay within max_entries"""
+
+    @abstractmethod
+    def keys(self, media_type: Optional[str] = None) -> Iterator[str]:
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    def close(self):
+        pass
+
+
+class SQLiteHashStore(HashStore):
+    """SQLite in WAL mode: primary key lookups, timestamp index for eviction"""
+
+    def __init__(self, path: str = HASH_DB_FILE, max_entries: int = MAX_HASH_ENTRIES,
+                 legacy_json: Optional[str] = HASH_FILE):
+        self.path = path
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                key TEXT PRIMARY KEY,
+                media_type TEXT,
+                timestamp INTEGER NOT NULL,
+                entry TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS hashes_timestamp ON hashes (timestamp);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.conn.commit()
+        if legacy_json:
+            self._migrate(legacy_json)
+        self._drop_legacy_videos()
+        self._count = self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+
+    def _migrate(self, json_path: str):
+        """One-time import of the old hash.json"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE name = 'json_migrated'").fetchone():
+            return
+        data = {}
+        try:
+            if os.path.exists(json_path):
+                with open(json_path, 'r') as f:
+                    data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading {json_path} for migration: {e}")
+            return
+        data = {key: entry for key, entry in data.items() if not self._is_legacy_video(entry)}
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO hashes (key, media_type, timestamp, entry) VALUES (?, ?, ?, ?)",
+                (self._row(key, entry) for key, entry in data.items()))
+            self.conn.execute("INSERT INTO meta (name, value) VALUES ('json_migrated', ?)", (json_path,))
+        if data:
+            logger.info(f"Migrated {len(data)} hash entries from {json_path}")
+
+    @staticmethod
+    def _is_legacy_video(entry: Dict) -> bool:
+        """Videos hashed from frame bytes before keyframe fingerprints; their key can never match again"""
+        media = entry.get('media', {})
+        return media.get('type') == 'video' and not media.get('frames')
+
+    def _drop_legacy_videos(self):
+        """One-time removal of legacy video rows migrated before they were filtered out"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE name = 'legacy_videos_dropped'").fetchone():
+            return
+        stale = [key for key, entry in self.conn.execute(
+            "SELECT key, entry FROM hashes WHERE media_type = 'video'")
+            if self._is_legacy_video(json.loads(entry))]
+        with self.conn:
+            self.conn.executemany("DELETE FROM hashes WHERE key = ?", ((key,) for key in stale))
+            self.conn.execute("INSERT INTO meta (name, value) VALUES ('legacy_videos_dropped', ?)", (str(len(stale)),))
+        if stale:
+            logger.info(f"Dropped {len(stale)} legacy video hashes that predate keyframe fingerprints")
+
+    @staticmethod
+    def _row(key: str, entry: Dict):
+        return (key, entry.get('media', {}).get('type'), int(entry.get('timestamp', 0)), json.dumps(entry))
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM hashes WHERE key = ?", (key,)).fetchone() is not None
+
+    def contains_many(self, keys: Iterable[str]) -> Set[str]:
+        keys = list(dict.fromkeys(keys))
+        found = set()
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            found.update(row[0] for row in self.conn.execute(
+                f"SELECT key FROM hashes WHERE key IN ({placeholders})", batch))
+        return found
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT entry FROM hashes WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add(self, entries: Dict[str, Dict]) -> List[str]:
+        evicted = []
+        with self.conn:
+            for key, entry in entries.items():
+                if key not in self:
+                    self._count += 1
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO hashes (key, media_type, timestamp, entry) VALUES (?, ?, ?, ?)",
+                    self._row(key, entry))
+            excess = self._count - self.max_entries
+            if excess > 0:
+                # Another connection (or process) may have deleted rows since _count was taken
+                self._count = self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+                excess = self._count - self.max_entries
+            if excess > 0:
+                evicted = [row[0] for row in self.conn.execute(
+                    "SELECT key FROM hashes ORDER BY timestamp, rowid LIMIT ?", (excess,))]
+                self.conn.executemany("DELETE FROM hashes WHERE key = ?", ((key,) for key in evicted))
+                self._count -= len(evicted)
+        if evicted:
+            logger.info(f"Removed {len(evicted)} oldest hash entries to maintain size limit")
+        return evicted
+
+    def keys(self, media_type: Optional[str] = None) -> Iterator[str]:
+        if media_type is None:
+            rows = self.conn.execute("SELECT key FROM hashes")
+        else:
+            rows = self.conn.execute("SELECT key FROM hashes WHERE media_type = ?", (media_type,))
+        for row in rows:
+            yield row[0]
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM hashes")
+        self._count = 0
+
+    def close(self):
+        self.conn.close()
+
+
+class JsonHashStore(HashStore):
+    """The original hash.json layout, with heap-based eviction"""
+
+    def __init__(self, path: str = HASH_FILE, max_entries: int = MAX_HASH_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.data: Dict[str, Dict] = {}
+        self._seq = itertools.count()
+        try:
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    self.data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading hash data: {e}")
+        self._heap = [(entry.get('timestamp', 0), next(self._seq), key) for key, entry in self.data.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.data
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.data.get(key)
+
+    def add(self, entries: Dict[str, Dict]) -> List[str]:
+        evicted = []
+        for key, entry in entries.items():
+            self.data[key] = entry
+            heapq.heappush(self._heap, (entry.get('timestamp', 0), next(self._seq), key))
+        while len(self.data) > self.max_entries and self._heap:
+            timestamp, _, key = heapq.heappop(self._heap)
+            # Skip heap records left behind when a key was refreshed
+            entry = self.data.get(key)
+            if entry is not None and entry.get('timestamp', 0) == timestamp:
+                del self.data[key]
+                evicted.append(key)
+        if evicted:
+            logger.info(f"Removed {len(evicted)} oldest hash entries to maintain size limit")
+        self._save()
+        return evicted
+
+    def keys(self, media_type: Optional[str] = None) -> Iterator[str]:
+        for key, entry in list(self.data.items()):
+            if media_type is None or entry.get('media', {}).get('type') == media_type:
+                yield key
+
+    def clear(self):
+        self.data.clear()
+        self._heap.clear()
+        self._save()
+
+    def _save(self):
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(self.data, f)
+        except Exception as e:
+            logger.error(f"Error saving hash data: {e}")
+
+
+def open_hash_store(backend: str = HASH_STORE_BACKEND) -> HashStore:
+    """Open the configured backend ('sqlite' or 'json')"""
+    if backend == 'json':
+        return JsonHashStore()
+    if backend != 'sqlite':
+        logger.warning(f"Unknown hash store backend '{backend}', using sqlite")
+    return SQLiteHashStore()
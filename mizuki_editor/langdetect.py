@@ -0,0 +1,90 @@
+import re
+import logging
+import unicodedata
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+ENGLISH_STOPWORDS = frozenset("""
+about after all also and any are at be been but by can could did does for from had has
+have he her his how if into is it its just not of or our out she than that the their them
+then there these they this were we what when which who with would you your
+""".split())
+
+SCRIPT_PREFIXES = (
+    ('CJK', 'zh'),
+    ('HIRAGANA', 'ja'),
+    ('KATAKANA', 'ja'),
+    ('HANGUL', 'ko'),
+    ('CYRILLIC', 'ru'),
+    ('ARABIC', 'ar'),
+    ('DEVANAGARI', 'hi'),
+    ('THAI', 'th'),
+    ('HEBREW', 'he'),
+    ('GREEK', 'el'),
+)
+
+
+def _script(char: str) -> str:
+    if char.isascii():
+        return 'LATIN'
+    name = unicodedata.name(char, '')
+    for prefix, _ in SCRIPT_PREFIXES:
+        if name.startswith(prefix):
+            return prefix
+    return 'LATIN' if 'LATIN' in name else 'OTHER'
+
+
+def detect_language(text: str, min_words: int = 4, stopword_ratio: float = 0.15) -> Optional[str]:
+    """Cheap offline guess of the caption language.
+
+    Returns an ISO code when the letters are dominated by one non-Latin
+    script, 'en' when mostly ASCII Latin text has enough English stopwords,
+    and None when unsure, in which case the caller should translate.
+    """
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return None
+
+    counts = {}
+    for c in letters:
+        script = _script(c)
+        counts[script] = counts.get(script, 0) + 1
+    script, count = max(counts.items(), key=lambda item: item[1])
+    if count / len(letters) < 0.8:
+        return None
+    if script != 'LATIN':
+        return dict(SCRIPT_PREFIXES).get(script)
+
+    if sum(1 for c in letters if not c.isascii()) / len(letters) > 0.05:
+        return None
+    words = [w.lower() for w in WORD_PATTERN.findall(text)]
+    if len(words) < min_words:
+        return None
+    hits = [w for w in words if w in ENGLISH_STOPWORDS]
+    if len(set(hits)) < 2:
+        return None
+    return 'en' if len(hits) / len(words) >= stopword_ratio else None
+
+
+class DetectionStats:
+    """Counts how often translation was skipped, logged every `interval` decisions"""
+
+    def __init__(self, interval: int = 100):
+        self.interval = interval
+        self.skipped = 0
+        self.translated = 0
+
+    def record(self, skipped: bool, language: Optional[str]):
+        if skipped:
+            self.skipped += 1
+        else:
+            self.translated += 1
+        logger.debug(f"Language detected: {language or 'unknown'} - "
+                     f"{'skipping' if skipped else 'sending to'} translator")
+        total = self.skipped + self.translated
+        if total % self.interval == 0:
+            logger.info(f"Translation skipped for {self.skipped}/{total} captions "
+                        f"({self.skipped / total:.1%}) by local language detection")
@@ -1,8 +1,8 @@
 import asyncio
-from collections import defaultdict
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 import logging
+from mizuki_editor.assembler import MediaGroupAssembler
 
 logger = logging.getLogger(__name__)
 
@@ -17,9 +17,16 @@ class MediaItem:
 class ProcessingQueue:
     def __init__(self):
         self.queue = asyncio.Queue()
-        self.processing_groups: Dict[int, List[MediaItem]] = defaultdict(list)
+        self.processing_groups: Dict[int, List[MediaItem]] = {}
+        self.assembler = MediaGroupAssembler(self._enqueue_group)
         self.lock = asyncio.Lock()
 
+    async def _enqueue_group(self, grouped_id: int, items: List[MediaItem]):
+        """Queue a media group once the assembler has all of its parts"""
+        async with self.lock:
+            self.processing_groups.setdefault(grouped_id, []).extend(items)
+            await self.queue.put((grouped_id, True))
+
     async def add_to_queue(
         self, 
         message_id: int, 
@@ -39,10 +46,7 @@ class ProcessingQueue:
         
         async with self.lock:
             if grouped_id:
-                self.processing_groups[grouped_id].append(item)
-                # Only add to queue if this is the first item in the group
-                if len(self.processing_groups[grouped_id]) == 1:
-                    await self.queue.put((grouped_id, True))
+                self.assembler.add(grouped_id, item)
             else:
                 await self.queue.put((item, False))
         
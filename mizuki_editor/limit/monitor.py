@@ -7,9 +7,11 @@ from datetime import datetime
 from telethon import TelegramClient, events
 from telethon.sessions import StringSession
 from telethon.network import ConnectionTcpFull
+from telethon.errors import ChannelPrivateError, ChannelInvalidError
 from mizuki_editor.limit.config import get_session_string_1, get_api_hash_1, get_api_id_1, get_source_id, get_target_id, VIDEO_HASH_FILE, JSON_FOLDER,escape_markdown_v2
 from mizuki_editor.limit.m_queue import ProcessingQueue
 from mizuki_editor.limit.content_checker import ContentChecker
+from mizuki_editor.monitor.entity_cache import get_entity_cache
 
 # Configure logging
 logging.basicConfig(
@@ -28,8 +30,10 @@ RETRY_DELAY = 2
 DOWNLOAD_TIMEOUT = 300  # 5 minutes
     
 class VideoMonitor:
-    def __init__(self):
-        self.client = TelegramClient(
+    def __init__(self, client=None):
+        # A client passed in is shared with the channel monitor and owned by the caller
+        self.owns_client = client is None
+        self.client = client if client is not None else TelegramClient(
             session=StringSession(get_session_string_1()),
             api_id=get_api_id_1(),
             api_hash=get_api_hash_1(),
@@ -42,6 +46,7 @@ class VideoMonitor:
         )
         self.source_channel = get_source_id()
         self.target_channel = get_target_id()
+        self.entities = get_entity_cache()
         self.queue = ProcessingQueue()
         self.content_checker = ContentChecker()
         self.processing_lock = asyncio.Lock()
@@ -49,6 +54,10 @@ class VideoMonitor:
         logger.info(f"🔄 Monitor initialized for source: {self.source_channel}, target: {self.target_channel}")
 
     async def calculate_file_hash(self, file_path):
+        """Calculate SHA256 hash on a worker thread so the shared client keeps polling"""
+        return await asyncio.to_thread(self._hash_file, file_path)
+
+    def _hash_file(self, file_path):
         """Calculate SHA256 hash with progress tracking"""
         sha256_hash = hashlib.sha256()
         try:
@@ -95,13 +104,15 @@ class VideoMonitor:
                 logger.info(f"🚀 Download attempt {attempt}/{MAX_RETRIES}")
                 logger.info(f"📦 Size: {file_size/1024/1024:.2f}MB | Chunk: {CHUNK_SIZE/1024/1024:.2f}MB")
 
-                with open(temp_path, 'wb') as f:
+                # Disk writes go to a thread so 5MB chunks don't stall the shared event loop
+                f = await asyncio.to_thread(open, temp_path, 'wb')
+                try:
                     downloaded = 0
                     start_time = datetime.now()
                     last_log_time = start_time
                     
                     async for chunk in self.client.iter_download(media, chunk_size=CHUNK_SIZE):
-                        f.write(chunk)
+                        await asyncio.to_thread(f.write, chunk)
                         downloaded += len(chunk)
                         
                         current_time = datetime.now()
@@ -117,6 +128,8 @@ class VideoMonitor:
                                 f"{speed:.2f}MB/s | ETA: {remaining:.0f}s"
                             )
                             last_log_time = current_time
+                finally:
+                    await asyncio.to_thread(f.close)
 
                 if os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
                     elapsed = (datetime.now() - start_time).total_seconds()
@@ -185,7 +198,7 @@ class VideoMonitor:
             # Forwarding phase
             logger.info("📤 Forwarding to target channel...")
             forwarded = await self.client.send_file(
-                self.target_channel,
+                await self.entities.get(self.client, self.target_channel),
                 file=temp_path,
                 caption=caption,
                 supports_streaming=True,
@@ -207,6 +220,10 @@ class VideoMonitor:
             logger.info(f"🎉 Success! Forwarded as message {forwarded.id}")
             return forwarded
 
+        except (ChannelPrivateError, ChannelInvalidError) as e:
+            logger.error(f"🚫 No access to target channel: {e}")
+            self.entities.invalidate(self.target_channel)
+            return None
         except Exception as e:
             logger.error(f"🔥 Critical error: {e}")
             return None
@@ -270,7 +287,7 @@ class VideoMonitor:
                 if message.text:
                     processed_text =message.text
                     await self.client.send_message(
-                        self.target_channel, 
+                        await self.entities.get(self.client, self.target_channel),
                         escape_markdown_v2(processed_text)
                     )
                     logger.info(f"📝 Forwarded text message: {message.id}")
@@ -303,18 +320,27 @@ class VideoMonitor:
 
     async def start(self):
         """Start monitoring the channel and processing queue"""
-        @self.client.on(events.NewMessage(chats=self.source_channel))
+        logger.info("🚀 Starting monitor...")
+        if self.owns_client:
+            await self.client.start()
+
+        source = await self.entities.get(self.client, self.source_channel)
+
         async def handler(event):
             try:
                 await self.process_message(event.message)
             except Exception as e:
                 logger.error(f"⚠️ Handler error: {e}")
 
+        self.client.add_event_handler(handler, events.NewMessage(chats=source))
+
         # Start the queue processor
-        asyncio.create_task(self.process_queue())
+        queue_task = asyncio.create_task(self.process_queue())
 
-        logger.info("🚀 Starting monitor...")
-        await self.client.start()
         logger.info("✅ Monitor running")
-        await self.client.run_until_disconnected()
-        
\ No newline at end of file
+        try:
+            await self.client.run_until_disconnected()
+        finally:
+            # A shared client outlives this run; a restart registers a fresh handler
+            self.client.remove_event_handler(handler)
+            queue_task.cancel()
@@ -1,69 +1,77 @@
 # main.py
 import logging
 import asyncio
-import time
-import random
-from asyncio import Lock
+from typing import List
 from telegram import Update
 from telegram.ext import ContextTypes
 from mizuki_editor.content_checker import ContentChecker
 from mizuki_editor.forward import forward_to_all_targets
-from collections import deque
+from mizuki_editor.scheduler import ShardedScheduler, MediaGroupJob
+from mizuki_editor.ratelimit import RateLimiter
+from util import EDITOR_WORKERS
 
 logger = logging.getLogger(__name__)
 
-message_queue = []
-queue_lock = Lock()
-
-class RateLimiter:
-    def __init__(self, max_calls, period):
-        self.max_calls = max_calls
-        self.period = period
-        self.timestamps = deque(maxlen=max_calls)
-        
-    async def wait(self):
-        now = time.time()
-        if len(self.timestamps) >= self.max_calls:
-            elapsed = now - self.timestamps[0]
-            if elapsed < self.period:
-                wait_time = self.period - elapsed
-                logger.debug(f"Rate limited - waiting {wait_time:.2f}s")
-                await asyncio.sleep(wait_time * random.uniform(0.8, 1.2))
-        self.timestamps.append(now)
-
-async def worker(context: ContextTypes.DEFAULT_TYPE):
-    if 'rate_limiter' not in context.bot_data:
-        context.bot_data['rate_limiter'] = RateLimiter(20, 60)
-    
+
+class EditorWorkers:
+    """The update shards and worker tasks of one Application.
+
+    Kept in bot_data so a restarted bot gets a fresh pool and stop() can
+    cancel the old workers instead of leaving them on a shut-down bot.
+    """
+
+    def __init__(self, workers: int = EDITOR_WORKERS):
+        self.scheduler = ShardedScheduler(workers)
+        self.rate_limiter = RateLimiter(20, 60, mode='sliding_window', name='editor_worker')
+        # Completed albums come back to their shard, under the same workers and rate limit
+        self.content_checker = ContentChecker(on_group_complete=self.scheduler.put_group)
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self, context: ContextTypes.DEFAULT_TYPE):
+        if self.tasks:
+            return
+        self.tasks = [asyncio.create_task(worker(self, context, worker_id))
+                      for worker_id in range(len(self.scheduler.shards))]
+        logger.info(f"Started {len(self.tasks)} workers for message processing")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        dropped = self.scheduler.qsize()
+        if dropped:
+            logger.warning(f"Dropped {dropped} queued updates on shutdown")
+
+
+async def worker(workers: EditorWorkers, context: ContextTypes.DEFAULT_TYPE, worker_id: int = 0):
+    queue = workers.scheduler.shard(worker_id)
+    checker = workers.content_checker
+
     while True:
-        await context.bot_data['rate_limiter'].wait()
-        
-        async with queue_lock:
-            if not message_queue:
-                context.bot_data["worker_started"] = False
-                logger.debug("Worker stopping - queue empty")
-                return
-            
-            message_queue.sort(key=lambda u: u.message.date.timestamp() 
-                              if u.message and u.message.date else 0)
-            update = message_queue.pop(0)
-        
+        update = await queue.get()
+
         try:
-            if 'content_checker' not in context.bot_data:
-                context.bot_data['content_checker'] = ContentChecker()
-            
-            checker = context.bot_data['content_checker']
+            if isinstance(update, MediaGroupJob):
+                await workers.rate_limiter.acquire()
+                await checker.process_media_group(update.group_id, update.messages)
+                continue
+
             msg = update.message
+            # Album parts are only buffered; waiting on the limiter here would
+            # spread them past the assembler's idle timeout and split the album
+            if not msg.media_group_id:
+                await workers.rate_limiter.acquire()
 
             result = await checker.process_message(msg)
             if result is None:
                 continue
-                
+
             if isinstance(result, str):
                 await forward_to_all_targets(context, text=result)
             elif isinstance(result, list):
                 await forward_to_all_targets(context, media=result)
-                
+
         except Exception as e:
             logger.error(f"Error handling queued message: {e}")
             if update.message:
@@ -71,18 +79,16 @@ async def worker(context: ContextTypes.DEFAULT_TYPE):
                     await update.message.reply_text("⚠️ Error processing your message. Please try again.")
                 except Exception as reply_error:
                     logger.error(f"Failed to send error reply: {reply_error}")
+        finally:
+            queue.task_done()
 
 async def handle_forwarded_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message is None:
         return
 
-    async with queue_lock:
-        message_queue.append(update)
-        queue_size = len(message_queue)
-    
-    logger.info(f"Message added to queue (size: {queue_size})")
-    
-    if not context.bot_data.get("worker_started", False):
-        context.bot_data["worker_started"] = True
-        asyncio.create_task(worker(context))
-        logger.info("Started new worker for message processing")
\ No newline at end of file
+    workers = context.bot_data.get('editor_workers')
+    if workers is None:
+        workers = context.bot_data['editor_workers'] = EditorWorkers()
+    workers.scheduler.put(update)
+    logger.info(f"Message added to queue (size: {workers.scheduler.qsize()})")
+    workers.start(context)
@@ -0,0 +1,132 @@
+from collections import deque
+from typing import Iterable, Iterator, List, Tuple
+
+
+def fold_case(text: str) -> str:
+    """Lowercase text without changing its length, so match offsets stay valid"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == '_'
+
+
+def is_word_boundary(text: str, pos: int) -> bool:
+    """Same rule as the regex \\b: word-ness differs on each side of pos"""
+    before = pos > 0 and _is_word_char(text[pos - 1])
+    after = pos < len(text) and _is_word_char(text[pos])
+    return before != after
+
+
+class WordMatcher:
+    """Case-insensitive Aho-Corasick automaton over a word list.
+
+    One linear scan finds every occurrence of every word. With whole_words
+    a match only counts when both ends sit on a regex word boundary, the same
+    as wrapping the word in \\b...\\b.
+    """
+
+    def __init__(self, words: Iterable[str], whole_words: bool = False):
+        self.whole_words = whole_words
+        self.words: List[str] = []
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        seen = set()
+        for word in words:
+            key = fold_case(word) if word else ''
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            self._insert(key, len(self.words))
+            self.words.append(word)
+        self._build()
+
+    def __len__(self):
+        return len(self.words)
+
+    def _insert(self, key: str, index: int):
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] = self._out[node] + (index,)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _scan(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        goto, fail, out, words = self._goto, self._fail, self._out, self.words
+        node = 0
+        for i, ch in enumerate(fold_case(text)):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for index in out[node]:
+                end = i + 1
+                start = end - len(words[index])
+                if self.whole_words and not (
+                        is_word_boundary(text, start) and is_word_boundary(text, end)):
+                    continue
+                yield start, end, index
+
+    def contains_any(self, text: str) -> bool:
+        """True as soon as any word is found"""
+        if not text or not self.words:
+            return False
+        for _ in self._scan(text):
+            return True
+        return False
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """Every (start, end, word) occurrence, overlaps included"""
+        if not text or not self.words:
+            return []
+        return [(start, end, self.words[index]) for start, end, index in self._scan(text)]
+
+    def find_longest(self, text: str) -> List[Tuple[int, int, str]]:
+        """Non-overlapping matches, leftmost first and longest at each position"""
+        if not text or not self.words:
+            return []
+        matches = sorted(self._scan(text), key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        last_end = 0
+        for start, end, index in matches:
+            if start >= last_end:
+                selected.append((start, end, self.words[index]))
+                last_end = end
+        return selected
+
+    def sub(self, repl, text: str) -> str:
+        """Replace each find_longest match with repl(word, matched_text)"""
+        matches = self.find_longest(text)
+        if not matches:
+            return text
+        parts = []
+        pos = 0
+        for start, end, word in matches:
+            parts.append(text[pos:start])
+            parts.append(repl(word, text[start:end]))
+            pos = end
+        parts.append(text[pos:])
+        return ''.join(parts)
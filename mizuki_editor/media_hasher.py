@@ -0,0 +1,163 @@
+import io
+import sys
+import hashlib
+import logging
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Union
+import imagehash
+from PIL import Image
+from util import MEDIA_HASH_POOL, MEDIA_HASH_WORKERS, MEDIA_HASH_TIMEOUT
+from mizuki_editor.executor import StageExecutor
+from mizuki_editor.download import download_budget, download_into, FileSizeExceeded
+
+logger = logging.getLogger(__name__)
+
+DIGEST_BLOCK_SIZE = 1 << 20
+# Smaller buffers are cheaper to pickle to the worker than to stage in shared memory
+SHARED_MEMORY_THRESHOLD = 256 * 1024
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Seekable read-only file over a memoryview, so PIL can decode a buffer without copying it"""
+
+    def __init__(self, view: memoryview):
+        self.view = view
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self.view) - self.pos))
+        b[:n] = self.view[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.pos = max(0, offset)
+        return self.pos
+
+    def tell(self) -> int:
+        return self.pos
+
+
+def phash_image_buffer(data: Buffer) -> str:
+    """pHash of an encoded image"""
+    with memoryview(data) as view, Image.open(MemoryViewReader(view)) as image:
+        return str(imagehash.phash(image))
+
+
+def hash_image_buffer(data: Buffer) -> Dict[str, str]:
+    """sha256, md5 and pHash of an encoded image, reading the buffer once for both digests"""
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    with memoryview(data) as view:
+        for offset in range(0, len(view), DIGEST_BLOCK_SIZE):
+            block = view[offset:offset + DIGEST_BLOCK_SIZE]
+            sha256.update(block)
+            md5.update(block)
+    return {'phash': phash_image_buffer(data), 'sha256': sha256.hexdigest(), 'md5': md5.hexdigest()}
+
+
+def _run_on_shared(func, name: str, size: int):
+    """func over the first `size` bytes of a shared memory block owned by the caller"""
+    shm = shared_memory.SharedMemory(name=name)
+    if sys.version_info < (3, 13):
+        # Attaching registers the block with the resource tracker, which would
+        # unlink it when this worker exits; the owner unlinks it instead.
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    try:
+        with shm.buf[:size] as view:
+            return func(view)
+    finally:
+        shm.close()
+
+
+def hash_shared_image(name: str, size: int) -> Dict[str, str]:
+    return _run_on_shared(hash_image_buffer, name, size)
+
+
+def phash_shared_image(name: str, size: int) -> str:
+    return _run_on_shared(phash_image_buffer, name, size)
+
+
+class MediaHasher:
+    """Image decoding and hashing off the event loop, on a pool of max_workers"""
+
+    def __init__(self, max_workers: int = MEDIA_HASH_WORKERS, kind: str = MEDIA_HASH_POOL,
+                 timeout: float = MEDIA_HASH_TIMEOUT):
+        self.stage = StageExecutor("media_hash", kind, max_workers, timeout=timeout)
+
+    async def hash_bytes(self, data: Buffer) -> Dict[str, str]:
+        """Digests and pHash of an encoded image held in memory"""
+        if self.stage.kind != 'process':
+            return await self.stage.run(hash_image_buffer, data)
+        if len(data) < SHARED_MEMORY_THRESHOLD:
+            return await self.stage.run(hash_image_buffer, bytes(data))
+        shm = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            shm.buf[:len(data)] = data
+            return await self.hash_shared(shm, len(data))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def hash_shared(self, shm: shared_memory.SharedMemory, size: int) -> Dict[str, str]:
+        """Digests and pHash of an image already written to shared memory; the caller keeps ownership"""
+        if self.stage.kind != 'process':
+            return await self.stage.run(hash_image_buffer, shm.buf[:size])
+        return await self.stage.run(hash_shared_image, shm.name, size)
+
+    async def hash_telegram_file(self, file) -> Dict[str, str]:
+        """Stream a telegram.File into one preallocated buffer and hash it.
+
+        sha256/md5 are fed chunk by chunk as the download arrives and the
+        pool decodes the same buffer for the pHash, so the photo is held in
+        memory once. Reservations against download_budget cap how much
+        photo data all downloads together keep resident.
+        """
+        size = file.file_size
+        if not size:
+            return await self.hash_bytes(await file.download_as_bytearray())
+
+        sha256 = hashlib.sha256()
+        md5 = hashlib.md5()
+
+        def on_chunk(chunk: memoryview):
+            sha256.update(chunk)
+            md5.update(chunk)
+
+        try:
+            async with download_budget.reserve(size):
+                if self.stage.kind == 'process':
+                    shm = shared_memory.SharedMemory(create=True, size=size)
+                    try:
+                        written = await download_into(file, shm.buf, on_chunk)
+                        phash = await self.stage.run(phash_shared_image, shm.name, written)
+                    finally:
+                        shm.close()
+                        shm.unlink()
+                else:
+                    buffer = bytearray(size)
+                    written = await download_into(file, memoryview(buffer), on_chunk)
+                    phash = await self.stage.run(phash_image_buffer, memoryview(buffer)[:written])
+        except FileSizeExceeded as e:
+            # The reported size was wrong; the digests so far are partial, so start over unbounded
+            logger.warning(f"{e}, downloading it whole")
+            return await self.hash_bytes(await file.download_as_bytearray())
+        return {'phash': phash, 'sha256': sha256.hexdigest(), 'md5': md5.hexdigest()}
+
+    def shutdown(self, wait: bool = False, cancel_futures: bool = True):
+        self.stage.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+media_hasher = MediaHasher()
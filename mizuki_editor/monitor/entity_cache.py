@@ -0,0 +1,112 @@
+import os
+import json
+import logging
+import threading
+import weakref
+from typing import Dict, Optional
+from telethon import TelegramClient
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+from util import ENTITY_CACHE_FILE, atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+
+def _peer_to_json(peer) -> Optional[Dict]:
+    if isinstance(peer, InputPeerChannel):
+        return {'type': 'channel', 'id': peer.channel_id, 'access_hash': peer.access_hash}
+    if isinstance(peer, InputPeerUser):
+        return {'type': 'user', 'id': peer.user_id, 'access_hash': peer.access_hash}
+    if isinstance(peer, InputPeerChat):
+        return {'type': 'chat', 'id': peer.chat_id}
+    return None
+
+
+def _peer_from_json(data: Dict):
+    if data['type'] == 'channel':
+        return InputPeerChannel(data['id'], data['access_hash'])
+    if data['type'] == 'user':
+        return InputPeerUser(data['id'], data['access_hash'])
+    return InputPeerChat(data['id'])
+
+
+class EntityCache:
+    """Input peers for chat ids, persisted so a restart does not resolve every channel again.
+
+    Access hashes belong to the account that resolved them, so entries are
+    kept per logged-in user. Callers should invalidate() an entry when
+    Telegram rejects it (ChannelPrivateError, ChannelInvalidError).
+    """
+
+    def __init__(self, path: str = ENTITY_CACHE_FILE):
+        self.path = path
+        self.peers: Dict[str, Dict[str, Dict]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._accounts = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    self.peers = json.load(f)
+                logger.info(f"Loaded cached entities for {len(self.peers)} account(s)")
+        except Exception as e:
+            logger.error(f"Error loading entity cache: {e}")
+            self.peers = {}
+
+    def _save(self):
+        with self._lock:
+            data = {account: dict(peers) for account, peers in self.peers.items()}
+        try:
+            atomic_write_json(self.path, data)
+        except Exception as e:
+            logger.error(f"Error saving entity cache: {e}")
+
+    async def _account(self, client: TelegramClient) -> str:
+        account = self._accounts.get(client)
+        if account is None:
+            me = await client.get_me(input_peer=True)
+            account = self._accounts[client] = str(me.user_id)
+        return account
+
+    async def get(self, client: TelegramClient, chat_id: int):
+        """Input peer for chat_id, resolved through Telegram only on a cache miss"""
+        account = await self._account(client)
+        with self._lock:
+            data = self.peers.get(account, {}).get(str(chat_id))
+        if data is not None:
+            self.hits += 1
+            return _peer_from_json(data)
+
+        self.misses += 1
+        peer = await client.get_input_entity(chat_id)
+        data = _peer_to_json(peer)
+        if data is not None:
+            with self._lock:
+                self.peers.setdefault(account, {})[str(chat_id)] = data
+            self._save()
+        return peer
+
+    def invalidate(self, chat_id: int):
+        """Forget chat_id for every account, so the next get() resolves it again"""
+        changed = False
+        with self._lock:
+            for peers in self.peers.values():
+                if peers.pop(str(chat_id), None) is not None:
+                    changed = True
+        if changed:
+            logger.info(f"Invalidated cached entity for {chat_id}")
+            self._save()
+
+
+_entity_cache: Optional[EntityCache] = None
+
+
+def get_entity_cache() -> EntityCache:
+    """The entity cache shared by the channel monitor, recovery and the video monitor"""
+    global _entity_cache
+    if _entity_cache is None:
+        _entity_cache = EntityCache()
+    return _entity_cache
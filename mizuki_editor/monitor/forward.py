@@ -1,15 +1,65 @@
 import logging
 from telethon.tl.types import MessageService
 from telethon.errors import FloodWaitError
+import time
 import asyncio
 import random
+from mizuki_editor.ratelimit import get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
+FORWARD_RATE = 20
+FORWARD_PERIOD = 60
+FORWARD_BURST = 5
+# Telegram accepts up to 100 message ids per forwardMessages request
+MAX_FORWARD_BATCH = 100
+
+def get_forward_limiter():
+    """Budget for forward requests from the user session to the bot"""
+    return get_rate_limiter('telethon_forward', FORWARD_RATE, FORWARD_PERIOD, burst=FORWARD_BURST)
+
+class ForwardFailed(Exception):
+    """Retries ran out; `sent` holds the ids of the messages that did go through"""
+
+    def __init__(self, sent):
+        super().__init__(f"Forward failed with {len(sent)} messages already sent")
+        self.sent = sent
+
+class AdaptivePacer:
+    """Spacing between forward requests, driven by flood-wait feedback.
+
+    Each flood wait doubles the gap (at least to a tenth of the wait Telegram
+    asked for); each success shrinks it by 10% back toward min_interval.
+    """
+
+    def __init__(self, min_interval: float = 1.0, max_interval: float = 60.0,
+                 increase: float = 2.0, decrease: float = 0.9):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.increase = increase
+        self.decrease = decrease
+        self.interval = min_interval
+        self._next_at = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        if self._next_at > now:
+            await asyncio.sleep(self._next_at - now)
+        self._next_at = max(now, self._next_at) + self.interval
+
+    def on_success(self):
+        self.interval = max(self.min_interval, self.interval * self.decrease)
+
+    def on_flood_wait(self, seconds: float):
+        self.interval = min(self.max_interval, max(self.interval * self.increase, seconds / 10))
+        logger.info(f"Forward pacing raised to {self.interval:.1f}s after a {seconds}s flood wait")
+
 class Forwarder:
-    def __init__(self, client, bot_username):
+    def __init__(self, client, bot_username, limiter=None, pacer=None):
         self.client = client
         self.bot_username = bot_username
+        self.limiter = limiter or get_forward_limiter()
+        self.pacer = pacer or AdaptivePacer()
 
     async def forward_message(self, message):
         """Forward a single message or media group to the bot"""
@@ -28,19 +78,29 @@ class Forwarder:
             return None
 
         try:
-            return await self.client.forward_messages(
-                self.bot_username,
-                message
-            )
+            await self.pacer.wait()
+            async with self.limiter:
+                result = await self.client.forward_messages(
+                    self.bot_username,
+                    message
+                )
+            self.pacer.on_success()
+            return result
         except FloodWaitError as e:
             logger.warning(f"Flood wait required: {e.seconds} seconds")
+            self.limiter.pause(e.seconds)
+            self.pacer.on_flood_wait(e.seconds)
             raise
         except Exception as e:
             logger.error(f"Forwarding error: {e}")
             raise
 
-    async def _forward_group(self, messages):
-        """Forward a media group while preserving its structure"""
+    async def _forward_group(self, messages, sent=None):
+        """Forward a media group while preserving its structure.
+
+        Ids of source messages that went through are added to `sent`, so a
+        retry after a flood wait can skip the slices already forwarded.
+        """
         if not messages:
             return []
         valid_messages = [msg for msg in messages if not isinstance(msg, MessageService)]
@@ -49,46 +109,61 @@ class Forwarder:
             logger.debug("No valid messages in group")
             return []
 
-        try:
-            return await self.client.forward_messages(
-                self.bot_username,
-                valid_messages
-            )
-        except FloodWaitError as e:
-            logger.warning(f"Flood wait required for group: {e.seconds} seconds")
-            raise
-        except Exception as e:
-            logger.error(f"Group forward failed: {e}")
-            # Fallback to individual forwarding
-            logger.info("Attempting individual forward as fallback")
-            results = []
-            for msg in valid_messages:
-                try:
-                    result = await self._forward_single(msg)
-                    if result:
-                        results.append(result)
-                except Exception as single_error:
-                    logger.error(f"Failed to forward single message: {single_error}")
-            return results
+        results = []
+        # One request per 100 ids; the limiter and pacer count requests, not messages
+        for i in range(0, len(valid_messages), MAX_FORWARD_BATCH):
+            batch = valid_messages[i:i + MAX_FORWARD_BATCH]
+            try:
+                await self.pacer.wait()
+                async with self.limiter:
+                    forwarded = await self.client.forward_messages(self.bot_username, batch)
+                self.pacer.on_success()
+                results.extend(forwarded if isinstance(forwarded, list) else [forwarded])
+                if sent is not None:
+                    sent.update(msg.id for msg in batch)
+            except FloodWaitError as e:
+                logger.warning(f"Flood wait required for group: {e.seconds} seconds")
+                self.limiter.pause(e.seconds)
+                self.pacer.on_flood_wait(e.seconds)
+                raise
+            except Exception as e:
+                logger.error(f"Group forward failed: {e}")
+                # Fall back to individual forwards for this slice only; earlier slices went through
+                logger.info("Attempting individual forward as fallback")
+                for msg in batch:
+                    try:
+                        result = await self._forward_single(msg)
+                        if result:
+                            results.append(result)
+                        if sent is not None:
+                            sent.add(msg.id)
+                    except Exception as single_error:
+                        logger.error(f"Failed to forward single message: {single_error}")
+        return results
 
     async def forward_with_retry(self, messages, max_retries=3):
-        """Forward messages with retry logic and jitter"""
+        """Forward messages with retry logic and jitter.
+
+        Raises ForwardFailed once max_retries is exhausted, carrying the ids
+        already forwarded so the caller requeues only the rest.
+        """
         if not isinstance(messages, list):
             messages = [messages]
 
+        sent = set()
         for attempt in range(1, max_retries + 1):
             try:
                 if len(messages) > 1:
-                    return await self._forward_group(messages)
+                    remaining = [msg for msg in messages if msg.id not in sent]
+                    return await self._forward_group(remaining, sent)
                 return await self._forward_single(messages[0])
             except FloodWaitError as e:
-                wait_time = e.seconds + random.uniform(1, 5)
-                logger.warning(f"Flood wait: Retry {attempt}/{max_retries} in {wait_time}s")
-                await asyncio.sleep(wait_time)
+                # The limiter is paused for the flood wait, the next attempt waits on it
+                logger.warning(f"Flood wait: Retry {attempt}/{max_retries} in {e.seconds}s")
             except Exception as e:
                 logger.error(f"Forward error: {e}")
                 wait_time = min(2 ** attempt, 60) * random.uniform(0.8, 1.2)
                 await asyncio.sleep(wait_time)
         
         logger.error(f"Failed to forward after {max_retries} attempts")
-        return None
\ No newline at end of file
+        raise ForwardFailed(sent)
\ No newline at end of file
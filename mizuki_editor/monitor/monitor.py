@@ -3,78 +3,103 @@ import asyncio
 import logging
 import os
 import time
-import random
-from collections import deque, defaultdict
+from collections import defaultdict, OrderedDict
+from typing import Optional
+from telethon import events
 from mizuki_editor.monitor.session import create_session
-from util import get_bot_username, load_channels, save_channels, SOURCE_FILE
+from util import get_bot_username, load_channels, remove_source_channels, SOURCE_FILE, MONITOR_MODE, MONITOR_GAP_FILL_INTERVAL
 from telethon.errors import ChannelPrivateError, ChannelInvalidError, FloodWaitError
 from mizuki_editor.monitor.recovery import RecoverySystem
-from mizuki_editor.monitor.forward import Forwarder
+from mizuki_editor.monitor.forward import Forwarder, ForwardFailed, MAX_FORWARD_BATCH
+from mizuki_editor.monitor.entity_cache import get_entity_cache
+from mizuki_editor.monitor.poller import AdaptivePollSchedule
+from mizuki_editor.monitor.work_queue import ChannelWorkQueue
+from mizuki_editor.monitor.sync import sync_channel_files
 
 logger = logging.getLogger(__name__)
 
+SEEN_IDS_PER_CHANNEL = 2000
+
 class ChannelMonitor:
-    def __init__(self):
+    def __init__(self, client=None):
         self.running = False
-        self.client = create_session()
+        # "events": Telethon update handlers plus a periodic gap-fill poll; "poll": poll only
+        self.mode = MONITOR_MODE
+        self.gap_fill_interval = MONITOR_GAP_FILL_INTERVAL
+        self.seen_ids = defaultdict(OrderedDict)
+        # A client passed in is shared with other components and owned by the caller
+        self.owns_client = client is None
+        self.client = client if client is not None else create_session()
         self.bot_username = get_bot_username()
         self.channel_ids = load_channels()
         self.last_message_ids = {}
         self.access_errors = {}
         self.forward_attempts = {} 
+        # Bounds how many channels are polled at once
         self.processing_semaphore = asyncio.Semaphore(3)
-        self.base_delay = 2
-        self.channel_check_jitter = (0, 10)
-        self.queue_delay_jitter = (0, 10)
+        self.poll_schedule = AdaptivePollSchedule()
         self.last_channel_file_check = time.time()  # Initialize with current time
         self.channel_file_check_interval = 30  # Reduced from 300 to 30 seconds
         
+        # When each channel's backoff ends, and how long the last one lasted
         self.channel_backoffs = defaultdict(float)
+        self.backoff_durations = {}
         self.min_backoff = 5
         self.max_backoff = 3600
         self.backoff_factor = 1.5
         
+        self.entities = get_entity_cache()
         self.recovery = RecoverySystem()
-        self.queue_lock = asyncio.Lock()
-        self.message_queue = deque()
-
-        asyncio.create_task(self.backoff_decay())
+        self.work_queue = ChannelWorkQueue()
+        self.forwarder = Forwarder(self.client, self.bot_username)
 
     async def backoff_decay(self):
         """Periodically reduce backoff times"""
         while self.running:
             await asyncio.sleep(3600)
-            for channel_id in list(self.channel_backoffs):
-                self.channel_backoffs[channel_id] *= 0.8
-                if self.channel_backoffs[channel_id] < self.min_backoff:
-                    del self.channel_backoffs[channel_id]
+            for channel_id in list(self.backoff_durations):
+                self.backoff_durations[channel_id] *= 0.8
+                if self.backoff_durations[channel_id] < self.min_backoff:
+                    del self.backoff_durations[channel_id]
 
     async def run(self):
         self.running = True
+        checkpointer = None
+        queue_task = None
+        sync_task = None
+        decay_task = asyncio.create_task(self.backoff_decay())
         try:
-            logging.getLogger("telethon.client.updates").setLevel(logging.WARNING)
-            await self.client.connect()
+            if self.owns_client:
+                logging.getLogger("telethon.client.updates").setLevel(logging.WARNING)
+                await self.client.connect()
 
-            if not await self.client.is_user_authorized():
-                logger.error("Session not authorized! Please run setup_session.py first.")
-                await self.client.disconnect()
-                return
-                
-            await self.client.start()
-            logger.info("Telethon session started")
+                if not await self.client.is_user_authorized():
+                    logger.error("Session not authorized! Please run setup_session.py first.")
+                    await self.client.disconnect()
+                    return
+
+                await self.client.start()
+                logger.info("Telethon session started")
 
             # Initialize recovery for all channels
             await self.initialize_all_channels()
 
             # Start queue processor
-            asyncio.create_task(self._process_queue())
+            queue_task = asyncio.create_task(self._process_queue())
+            checkpointer = asyncio.create_task(self.recovery.run_checkpointer())
+            sync_task = asyncio.create_task(sync_channel_files(self.recovery))
+
+            if self.mode == "events":
+                await self._run_event_mode()
+                return
 
             logger.info("Starting continuous channel monitoring with %d channels", len(self.channel_ids))
             while self.running:
                 try:
                     await self._check_channel_file_updates()
                     await self.monitor_channels()
-                    await asyncio.sleep(1)  # Small sleep between full cycles
+                    # Sleep until the next channel is due, waking regularly for source file changes
+                    await asyncio.sleep(max(1, min(5, self.poll_schedule.seconds_until_next(self.channel_ids))))
                 except Exception as e:
                     logger.error(f"Error in main monitoring loop: {e}", exc_info=True)
                     await asyncio.sleep(5)
@@ -83,17 +108,90 @@ class ChannelMonitor:
             logger.error(f"Monitor crashed: {e}", exc_info=True)
         finally:
             self.running = False
+            # A shared client outlives this run; do not leave handlers or tasks behind on it
+            self.client.remove_event_handler(self._on_new_message)
+            self.client.remove_event_handler(self._on_album)
+            for task in (queue_task, checkpointer, sync_task, decay_task):
+                if task is not None:
+                    task.cancel()
+            self.recovery.flush()
+            if self.owns_client:
+                try:
+                    await self.client.disconnect()
+                except Exception as e:
+                    logger.error(f"Error disconnecting client: {e}")
+
+    async def _run_event_mode(self):
+        """Receive new posts as updates; poll only to fill gaps after restarts and reconnects"""
+        self.client.add_event_handler(
+            self._on_new_message, events.NewMessage(func=self._is_source_event))
+        self.client.add_event_handler(
+            self._on_album, events.Album(func=self._is_source_event))
+        logger.info("Listening for updates from %d channels (gap fill every %ds)",
+                    len(self.channel_ids), self.gap_fill_interval)
+
+        # Catch up on whatever was posted while we were down
+        last_gap_fill = 0.0
+        was_connected = True
+        while self.running:
             try:
-                await self.client.disconnect()
+                await self._check_channel_file_updates()
+                connected = self.client.is_connected()
+                reconnected = connected and not was_connected
+                was_connected = connected
+                if connected and (reconnected or time.time() - last_gap_fill >= self.gap_fill_interval):
+                    if reconnected:
+                        logger.info("Client reconnected - polling channels for missed messages")
+                    await self.monitor_channels(poll_all=True)
+                    last_gap_fill = time.time()
+                await asyncio.sleep(5)
             except Exception as e:
-                logger.error(f"Error disconnecting client: {e}")
+                logger.error(f"Error in event-mode monitoring loop: {e}", exc_info=True)
+                await asyncio.sleep(5)
+
+    def _is_source_event(self, event) -> bool:
+        return event.chat_id in self.channel_ids
+
+    async def _on_new_message(self, event):
+        # Album parts arrive again, together, through the Album handler
+        if event.message.grouped_id:
+            return
+        await self._enqueue_messages(event.chat_id, [event.message])
+
+    async def _on_album(self, event):
+        await self._enqueue_messages(event.chat_id, list(event.messages))
+
+    def _claim_new(self, channel_id, messages):
+        """Drop messages already queued by the other path (update or gap-fill poll)"""
+        seen = self.seen_ids[channel_id]
+        fresh = []
+        for msg in messages:
+            if msg.id in seen:
+                continue
+            seen[msg.id] = None
+            fresh.append(msg)
+        while len(seen) > SEEN_IDS_PER_CHANNEL:
+            seen.popitem(last=False)
+        return fresh
+
+    async def _enqueue_messages(self, channel_id, messages):
+        """Queue messages received as updates"""
+        try:
+            messages = self._claim_new(channel_id, messages)
+            if not messages:
+                return
+            self.recovery.update_channel_state(channel_id, max(msg.id for msg in messages))
+            self.work_queue.put(channel_id, messages)
+            logger.info(f"Queued {len(messages)} new message(s) from channel {channel_id}")
+        except Exception as e:
+            logger.error(f"Error queueing update from channel {channel_id}: {e}")
 
     async def initialize_all_channels(self):
         """Initialize all channels in the list"""
         for channel_id in self.channel_ids:
             try:
                 await self.recovery.initialize_channel_state(self.client, channel_id)
-                entity = await self.client.get_entity(channel_id)
+                entity = await self.entities.get(self.client, channel_id)
                 messages = await self.client.get_messages(entity, limit=1)
                 if messages:
                     self.last_message_ids[channel_id] = messages[0].id
@@ -105,34 +203,56 @@ class ChannelMonitor:
                 logger.error(f"Error initializing channel {channel_id}: {e}")
                 self.last_message_ids[channel_id] = 0
 
-    async def monitor_channels(self):
-        """Monitor all channels for new messages"""
-        valid_channels = []
-        for channel_id in self.channel_ids:
-            if self.access_errors.get(channel_id, 0) > 5:
-                logger.warning(f"Skipping channel {channel_id} due to persistent errors")
-                continue
+    async def monitor_channels(self, poll_all: bool = False):
+        """Poll the channels that are due (or all of them) concurrently for new messages"""
+        now = time.time()
+        channel_ids = list(self.channel_ids)
+        to_poll = channel_ids if poll_all else self.poll_schedule.due(channel_ids, now)
+        if not to_poll:
+            return
+
+        results = await asyncio.gather(*(self._poll_channel(channel_id) for channel_id in to_poll))
+        failed = {channel_id for channel_id, ok in zip(to_poll, results) if ok is False}
+
+        if failed:
+            self.channel_ids = [c for c in self.channel_ids if c not in failed]
+            for channel_id in failed:
+                self.poll_schedule.forget(channel_id)
+            # Remove only the failed channels from the file, so /a edits from the bot
+            # process survive; the file check picks those up as added channels
+            remove_source_channels(failed)
+            logger.info("Updated channel list with %d valid channels", len(self.channel_ids))
+
+    async def _poll_channel(self, channel_id) -> Optional[bool]:
+        """Poll one channel under the shared semaphore; False if it should be dropped, None if skipped"""
+        if self.access_errors.get(channel_id, 0) > 5:
+            logger.warning(f"Skipping channel {channel_id} due to persistent errors")
+            return False
 
+        backoff_end = self.channel_backoffs.get(channel_id, 0)
+        if backoff_end > time.time():
+            self.poll_schedule.defer(channel_id, backoff_end)
+            return None
+
+        async with self.processing_semaphore:
             try:
-                await self.check_channel(channel_id)
+                new_messages = await self.check_channel(channel_id)
                 self.access_errors[channel_id] = 0
-                valid_channels.append(channel_id)
+                self.poll_schedule.record(channel_id, new_messages)
+                return True
             except (ChannelPrivateError, ChannelInvalidError) as e:
                 logger.error(f"No access to channel {channel_id}: {e}")
+                self.entities.invalidate(channel_id)
                 self.access_errors[channel_id] = self.access_errors.get(channel_id, 0) + 1
+                return False
             except FloodWaitError as e:
                 logger.warning(f"Flood wait required for {channel_id}: {e.seconds} seconds")
-                await asyncio.sleep(e.seconds + 5)
+                self.poll_schedule.pause(e.seconds + 5)
+                return None
             except Exception as e:
                 logger.error(f"Error checking channel {channel_id}: {e}")
                 self.access_errors[channel_id] = self.access_errors.get(channel_id, 0) + 1
-
-            await asyncio.sleep(random.uniform(*self.channel_check_jitter))
-
-        if len(valid_channels) != len(self.channel_ids):
-            self.channel_ids = valid_channels
-            save_channels(self.channel_ids)
-            logger.info("Updated channel list with %d valid channels", len(valid_channels))
+                return False
 
     async def _check_channel_file_updates(self):
         """Check for updates to the channel source file and reload if needed"""
@@ -158,7 +278,7 @@ class ChannelMonitor:
                     
                     for channel_id in added:
                         try:
-                            entity = await self.client.get_entity(channel_id)
+                            entity = await self.entities.get(self.client, channel_id)
     
                             messages = await self.client.get_messages(
                                 entity,
@@ -185,8 +305,8 @@ class ChannelMonitor:
                             del self.last_message_ids[channel_id]
                         if channel_id in self.access_errors:
                             del self.access_errors[channel_id]
-                        if channel_id in self.recovery.last_message_ids:
-                            del self.recovery.last_message_ids[channel_id]
+                        self.poll_schedule.forget(channel_id)
+                        self.recovery.remove_channel(channel_id)
                         logger.info(f"Removed channel {channel_id} from monitoring")
 
         except Exception as e:
@@ -194,14 +314,13 @@ class ChannelMonitor:
         finally:
             self.last_channel_file_check = current_time
 
-    async def check_channel(self, channel_id):
-        """Check a channel for new messages and add them to processing queue"""
+    async def check_channel(self, channel_id) -> int:
+        """Check a channel for new messages and add them to processing queue, returning how many were new"""
         last_id = self.recovery.get_last_message_id(channel_id)
         try:
-            entity = await self.client.get_entity(channel_id)
+            entity = await self.entities.get(self.client, channel_id)
             
-            async with self.queue_lock:
-                queue_size = len(self.message_queue)
+            queue_size = len(self.work_queue)
             max_messages = 5 if queue_size > 20 else 100
             
             messages = await self.client.get_messages(
@@ -212,9 +331,9 @@ class ChannelMonitor:
             )
             
             if not messages:
-                return
+                return 0
                 
-            new_messages = [msg for msg in messages if msg.id > last_id]
+            new_messages = self._claim_new(channel_id, [msg for msg in messages if msg.id > last_id])
             
             if new_messages:
                 logger.info(f"Found {len(new_messages)} new messages in channel {channel_id}")
@@ -230,13 +349,13 @@ class ChannelMonitor:
                     else:
                         single.append(msg)
                 
-                async with self.queue_lock:
-                    for group in grouped.values():
-                        self.message_queue.append((channel_id, group))
-                    
-                    for i in range(0, len(single), 5):
-                        batch = single[i:i+5]
-                        self.message_queue.append((channel_id, batch))
+                for group in grouped.values():
+                    self.work_queue.put(channel_id, group)
+                
+                for msg in single:
+                    self.work_queue.put(channel_id, [msg])
+
+            return len(new_messages)
                         
         except Exception as e:
             logger.error(f"Error checking channel {channel_id}: {e}")
@@ -246,47 +365,35 @@ class ChannelMonitor:
         """Process messages from the queue with delays and backoffs"""
         logger.info("Queue processor started")
         while self.running:  
-            async with self.queue_lock:
-                if not self.message_queue:
-                    await asyncio.sleep(1)
-                    continue
-                
-                channel_id, messages = self.message_queue.popleft()
-                
+            channel_id, messages = await self.work_queue.get()
+            # Forward everything else queued for this channel in the same request;
+            # items are whole albums or single posts, so albums stay intact
+            for more in self.work_queue.take_more(channel_id, MAX_FORWARD_BATCH - len(messages)):
+                messages = messages + more
+            messages.sort(key=lambda m: m.id)
             current_time = time.time()
-            backoff_end = self.channel_backoffs.get(channel_id, 0)
-            if current_time < backoff_end:
-                wait_time = backoff_end - current_time
-                logger.info(f"Channel {channel_id} in backoff, waiting {wait_time:.1f}s")
-                await asyncio.sleep(wait_time)
-                async with self.queue_lock:
-                    self.message_queue.appendleft((channel_id, messages))
-                continue
                 
             try:
-                jitter = random.uniform(*self.queue_delay_jitter)
-                total_delay = self.base_delay + jitter
-                logger.debug(f"Waiting {total_delay:.2f}s before processing {len(messages)} messages from {channel_id}")
-                await asyncio.sleep(total_delay)
-                
-                forwarder = Forwarder(self.client, self.bot_username)
-                result = await forwarder.forward_with_retry(messages)
-                
-                if not result:
-                    current_backoff = self.channel_backoffs.get(channel_id, self.min_backoff)
-                    new_backoff = min(current_backoff * self.backoff_factor, self.max_backoff)
-                    self.channel_backoffs[channel_id] = current_time + new_backoff
-                    logger.warning(f"Set backoff for channel {channel_id}: {new_backoff:.1f}s")
-                    
-                    async with self.queue_lock:
-                        self.message_queue.appendleft((channel_id, messages))
-                else:
-                    if messages:
-                        last_id = max(m.id for m in messages)
-                        self.recovery.update_channel_state(channel_id, last_id)
-                
+                logger.debug(f"Forwarding {len(messages)} messages from {channel_id}")
+                await self.forwarder.forward_with_retry(messages)
+            except ForwardFailed as e:
+                current_backoff = self.backoff_durations.get(channel_id, self.min_backoff)
+                new_backoff = min(current_backoff * self.backoff_factor, self.max_backoff)
+                self.backoff_durations[channel_id] = new_backoff
+                self.channel_backoffs[channel_id] = current_time + new_backoff
+                logger.warning(f"Set backoff for channel {channel_id}: {new_backoff:.1f}s")
+
+                # Requeue only what did not go through, so forwarded slices are not sent twice;
+                # only this channel waits, the others keep forwarding
+                remaining = [m for m in messages if m.id not in e.sent]
+                if remaining:
+                    self.work_queue.put(channel_id, remaining, front=True)
+                    self.work_queue.delay(channel_id, self.channel_backoffs[channel_id])
             except Exception as e:
                 logger.error(f"Error processing queue item: {e}")
-                async with self.queue_lock:
-                    self.message_queue.appendleft((channel_id, messages))
-                await asyncio.sleep(10)
\ No newline at end of file
+                self.work_queue.put(channel_id, messages, front=True)
+                self.work_queue.delay(channel_id, time.time() + 10)
+            else:
+                if messages:
+                    last_id = max(m.id for m in messages)
+                    self.recovery.update_channel_state(channel_id, last_id)
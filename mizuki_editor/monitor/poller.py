@@ -0,0 +1,77 @@
+import time
+import random
+import logging
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MIN_POLL_INTERVAL = 15
+MAX_POLL_INTERVAL = 900
+# Aim to find about this many new messages per poll
+TARGET_MESSAGES_PER_POLL = 2
+RATE_SMOOTHING = 0.3
+
+
+class AdaptivePollSchedule:
+    """When each source channel is next due for a poll.
+
+    Keeps an exponentially weighted moving average of each channel's
+    message rate and polls it about every TARGET_MESSAGES_PER_POLL / rate
+    seconds, clamped to [min_interval, max_interval]: a channel posting
+    every minute is polled every couple of minutes, one posting a few
+    times a day drifts out to max_interval.
+    """
+
+    def __init__(self, min_interval: float = MIN_POLL_INTERVAL, max_interval: float = MAX_POLL_INTERVAL,
+                 target: float = TARGET_MESSAGES_PER_POLL, smoothing: float = RATE_SMOOTHING):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target = target
+        self.smoothing = smoothing
+        self.rates: Dict[int, float] = {}
+        self.last_poll: Dict[int, float] = {}
+        self.next_poll: Dict[int, float] = {}
+        self.paused_until = 0.0
+
+    def interval(self, channel_id: int) -> float:
+        rate = self.rates.get(channel_id)
+        if not rate:
+            return self.min_interval if rate is None else self.max_interval
+        return max(self.min_interval, min(self.max_interval, self.target / rate))
+
+    def record(self, channel_id: int, new_messages: int, now: Optional[float] = None):
+        """Fold one poll's result into the channel's rate and schedule its next poll"""
+        now = now or time.time()
+        last = self.last_poll.get(channel_id)
+        if last is not None and now > last:
+            observed = new_messages / (now - last)
+            previous = self.rates.get(channel_id, observed)
+            self.rates[channel_id] = self.smoothing * observed + (1 - self.smoothing) * previous
+        self.last_poll[channel_id] = now
+        # Jitter keeps channels with equal intervals from being polled in lockstep
+        self.next_poll[channel_id] = now + self.interval(channel_id) * random.uniform(0.9, 1.1)
+
+    def defer(self, channel_id: int, until: float):
+        """Do not poll channel_id before `until` (e.g. while it is backing off)"""
+        self.next_poll[channel_id] = max(self.next_poll.get(channel_id, 0.0), until)
+
+    def pause(self, seconds: float):
+        """Hold every poll, e.g. for a flood wait"""
+        self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    def due(self, channel_ids: Iterable[int], now: Optional[float] = None) -> List[int]:
+        now = now or time.time()
+        if now < self.paused_until:
+            return []
+        return [c for c in channel_ids if self.next_poll.get(c, 0.0) <= now]
+
+    def seconds_until_next(self, channel_ids: Iterable[int], now: Optional[float] = None) -> float:
+        now = now or time.time()
+        upcoming = [self.next_poll.get(c, 0.0) for c in channel_ids]
+        next_time = max(min(upcoming, default=now + self.min_interval), self.paused_until)
+        return max(0.0, next_time - now)
+
+    def forget(self, channel_id: int):
+        self.rates.pop(channel_id, None)
+        self.last_poll.pop(channel_id, None)
+        self.next_poll.pop(channel_id, None)
@@ -1,18 +1,44 @@
 import json
+import atexit
+import asyncio
 import logging
 import os
+import weakref
+import threading
 from typing import Dict, Optional
 from telethon import TelegramClient
 from telethon.tl.types import MessageService
 from telethon.errors import ChannelPrivateError
-from util import RECOVERY_FILE, get_target_channel
+from util import RECOVERY_FILE, CHECKPOINT_INTERVAL, get_target_channel, atomic_write_json
+from mizuki_editor.monitor.entity_cache import get_entity_cache
 
 logger = logging.getLogger(__name__)
 
+# Live instances, flushed by one exit hook however often the monitor is restarted
+_instances = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all():
+    for recovery in list(_instances):
+        recovery.flush()
+
+
 class RecoverySystem:
-    def __init__(self):
+    """Last processed message id per channel.
+
+    Checkpoints are write-behind: update_channel_state only marks the state
+    dirty and run_checkpointer (or flush on shutdown) writes it atomically.
+    """
+
+    def __init__(self, flush_interval: float = CHECKPOINT_INTERVAL):
         self.last_message_ids: Dict[int, int] = {}
+        self.entities = get_entity_cache()
+        self.flush_interval = flush_interval
+        self._dirty = False
+        self._lock = threading.Lock()
         self._load_recovery_data()
+        _instances.add(self)
 
     def _load_recovery_data(self):
         """Load recovery data from JSON file"""
@@ -29,21 +55,40 @@ class RecoverySystem:
 
     def save_recovery_data(self):
         """Save recovery data to JSON file"""
+        with self._lock:
+            data = dict(self.last_message_ids)
+            self._dirty = False
         try:
-            with open(RECOVERY_FILE, 'w') as f:
-                json.dump(self.last_message_ids, f, indent=2)
+            atomic_write_json(RECOVERY_FILE, data, indent=2)
             logger.debug("Recovery data saved successfully")
         except Exception as e:
+            with self._lock:
+                self._dirty = True
             logger.error(f"Error saving recovery data: {e}")
 
+    def flush(self):
+        """Write the checkpoints if any changed since the last save"""
+        if self._dirty:
+            self.save_recovery_data()
+
+    async def run_checkpointer(self):
+        """Flush dirty checkpoints every flush_interval seconds until cancelled, then once more"""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                self.flush()
+        finally:
+            self.flush()
+
     def update_channel_state(self, channel_id: int, last_message_id: int):
         """Update the last processed message ID for a channel"""
-        current_last = self.last_message_ids.get(channel_id, 0)
-        
-        if last_message_id > current_last:
+        with self._lock:
+            current_last = self.last_message_ids.get(channel_id, 0)
+            if last_message_id <= current_last:
+                return
             self.last_message_ids[channel_id] = last_message_id
-            self.save_recovery_data()
-            logger.debug(f"Updated channel {channel_id} to last ID: {last_message_id}")
+            self._dirty = True
+        logger.debug(f"Updated channel {channel_id} to last ID: {last_message_id}")
 
     def get_last_message_id(self, channel_id: int) -> int:
         """Get last processed message ID for a channel"""
@@ -53,7 +98,7 @@ class RecoverySystem:
         """Initialize channel state if not in recovery file"""
         if channel_id not in self.last_message_ids:
             try:
-                entity = await client.get_entity(channel_id)
+                entity = await self.entities.get(client, channel_id)
                 
                 messages = await client.get_messages(
                     entity, 
@@ -80,6 +125,7 @@ class RecoverySystem:
                 self.update_channel_state(channel_id, 0)
             except ChannelPrivateError:
                 logger.error(f"Bot has no access to channel {channel_id}")
+                self.entities.invalidate(channel_id)
                 self.update_channel_state(channel_id, 0)
             except Exception as e:
                 logger.error(f"Error initializing channel {channel_id}: {e}")
@@ -111,12 +157,22 @@ class RecoverySystem:
         """Get all channel states as a dictionary"""
         return self.last_message_ids.copy()
 
+    def track_channel(self, channel_id: int):
+        """Start tracking a channel at 0 unless it already has a checkpoint"""
+        with self._lock:
+            if channel_id in self.last_message_ids:
+                return
+            self.last_message_ids[channel_id] = 0
+            self._dirty = True
+        logger.info(f"Added channel {channel_id} to recovery tracking")
+
     def remove_channel(self, channel_id: int):
         """Remove a channel from recovery tracking"""
-        if channel_id in self.last_message_ids:
-            del self.last_message_ids[channel_id]
-            self.save_recovery_data()
-            logger.info(f"Removed channel {channel_id} from recovery tracking")
+        with self._lock:
+            if self.last_message_ids.pop(channel_id, None) is None:
+                return
+            self._dirty = True
+        logger.info(f"Removed channel {channel_id} from recovery tracking")
 
     def clear_all_states(self):
         """Clear all recovery states (for debugging)"""
@@ -1,5 +1,8 @@
+import asyncio
+from typing import Optional
 from telethon import TelegramClient
 from telethon.sessions import StringSession
+from telethon.network import ConnectionTcpFull
 from util import get_session_string, get_api_hash, get_api_id
 import logging
 
@@ -9,10 +12,48 @@ def create_session():
     session_string = get_session_string()
     if not session_string:
         raise ValueError("Session string not found in .env file")
-    
+
     client = TelegramClient(
         session=StringSession(session_string),
         api_id=get_api_id(),
-        api_hash=get_api_hash()
+        api_hash=get_api_hash(),
+        connection=ConnectionTcpFull,
+        connection_retries=5,
+        auto_reconnect=True,
+        request_retries=3,
+        flood_sleep_threshold=60
     )
-    return client
\ No newline at end of file
+    return client
+
+
+class SharedSession:
+    """The single user-session client that every Telethon component of a process attaches to.
+
+    Two clients logged in with the same SESSION_STRING poll everything twice
+    and fight over the auth key, so the channel monitor and the video
+    monitor share this one and only the owner connects or disconnects it.
+    """
+
+    def __init__(self):
+        self.client = create_session()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def ready(self) -> TelegramClient:
+        """The connected, authorized client, reconnecting it if a component finds it down"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.client.is_connected():
+                logging.getLogger("telethon.client.updates").setLevel(logging.WARNING)
+                await self.client.connect()
+                if not await self.client.is_user_authorized():
+                    await self.client.disconnect()
+                    raise RuntimeError("Session not authorized! Please run setup_session.py first.")
+                logger.info("Telethon session started")
+        return self.client
+
+    async def close(self):
+        try:
+            await self.client.disconnect()
+        except Exception as e:
+            logger.error(f"Error disconnecting client: {e}")
@@ -1,18 +1,20 @@
-from util import RECOVERY_FILE,load_channels
-import json 
+from util import load_channels
 import logging
 import asyncio
+from mizuki_editor.monitor.recovery import RecoverySystem
 
 logger=logging.getLogger(__name__)
 
-async def sync_channel_files():
-    """Ensure source_id.json and last_message_id.json stay synchronized"""
+async def sync_channel_files(recovery: RecoverySystem):
+    """Ensure the recovery checkpoints track exactly the channels in source_id.json.
+
+    Changes go through the live RecoverySystem, whose checkpointer writes
+    last_message_id.json, so newer in-memory ids are never overwritten.
+    """
     while True:
         try:
             source_channels = set(load_channels())
-            with open(RECOVERY_FILE, 'r') as f:
-                recovery_data = json.load(f)
-            recovery_channels = set(map(int, recovery_data.keys()))
+            recovery_channels = set(recovery.get_channel_states())
             
             added = source_channels - recovery_channels
             removed = recovery_channels - source_channels
@@ -20,15 +22,12 @@ async def sync_channel_files():
             if added or removed:
                 logger.info(f"Syncing channel files - Added: {added}, Removed: {removed}")
                 for channel in added:
-                    recovery_data[str(channel)] = 0
+                    recovery.track_channel(channel)
                 for channel in removed:
-                    recovery_data.pop(str(channel), None)
-                
-                with open(RECOVERY_FILE, 'w') as f:
-                    json.dump(recovery_data, f, indent=2)
+                    recovery.remove_channel(channel)
             
             await asyncio.sleep(60)  
             
         except Exception as e:
             logger.error(f"Error syncing channel files: {e}")
-            await asyncio.sleep(30)
\ No newline at end of file
+            await asyncio.sleep(30)
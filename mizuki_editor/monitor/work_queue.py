@@ -0,0 +1,114 @@
+import time
+import heapq
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelWorkQueue:
+    """Per-channel FIFO subqueues with per-channel delays.
+
+    get() serves the channels that are ready round-robin, one item at a
+    time, so a burst from one channel does not starve the others. A channel
+    put on delay() (e.g. backing off after a flood wait) keeps its items in
+    order but is skipped until its time comes, without holding up the rest.
+    Consumers sleep until work is put or a delay expires instead of polling.
+    """
+
+    def __init__(self):
+        self._queues: Dict[Hashable, deque] = {}
+        self._ready: deque = deque()
+        self._delayed: List[Tuple[float, Hashable]] = []
+        self._due: Dict[Hashable, float] = {}
+        self._not_before: Dict[Hashable, float] = {}
+        self._scheduled: Set[Hashable] = set()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def _schedule(self, channel_id: Hashable):
+        """Put a channel with pending items in the ready ring or the delay heap"""
+        if channel_id in self._scheduled or not self._queues.get(channel_id):
+            return
+        not_before = self._not_before.get(channel_id, 0.0)
+        if not_before > time.time():
+            self._due[channel_id] = not_before
+            heapq.heappush(self._delayed, (not_before, channel_id))
+        else:
+            self._not_before.pop(channel_id, None)
+            self._ready.append(channel_id)
+        self._scheduled.add(channel_id)
+
+    def put(self, channel_id: Hashable, item: Any, front: bool = False):
+        """Queue an item for a channel; front=True puts a failed item back at the head"""
+        queue = self._queues.setdefault(channel_id, deque())
+        if front:
+            queue.appendleft(item)
+        else:
+            queue.append(item)
+        self._schedule(channel_id)
+        self._wakeup.set()
+
+    def delay(self, channel_id: Hashable, until: float):
+        """Hold a channel's items until the time.time() value `until`"""
+        self._not_before[channel_id] = max(self._not_before.get(channel_id, 0.0), until)
+        if channel_id in self._scheduled and channel_id not in self._due:
+            self._ready.remove(channel_id)
+            self._scheduled.discard(channel_id)
+        elif channel_id in self._due:
+            # Re-push with the later time; the old heap entry is skipped as stale
+            self._scheduled.discard(channel_id)
+            del self._due[channel_id]
+        self._schedule(channel_id)
+        self._wakeup.set()
+
+    def _promote_due(self, now: float):
+        while self._delayed and self._delayed[0][0] <= now:
+            due, channel_id = heapq.heappop(self._delayed)
+            if self._due.get(channel_id) != due:
+                continue
+            del self._due[channel_id]
+            self._not_before.pop(channel_id, None)
+            self._ready.append(channel_id)
+
+    async def get(self) -> Tuple[Hashable, Any]:
+        """Next (channel_id, item) from a channel that is not delayed"""
+        while True:
+            now = time.time()
+            self._promote_due(now)
+            if self._ready:
+                channel_id = self._ready.popleft()
+                self._scheduled.discard(channel_id)
+                queue = self._queues.get(channel_id)
+                if not queue:
+                    # Emptied by take_more() while it waited its turn
+                    continue
+                item = queue.popleft()
+                if queue:
+                    self._schedule(channel_id)
+                else:
+                    del self._queues[channel_id]
+                return channel_id, item
+
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def take_more(self, channel_id: Hashable, budget: int, size: Callable[[Any], int] = len) -> List[Any]:
+        """Pop further items of one channel from the head while their total size fits in budget"""
+        queue = self._queues.get(channel_id)
+        taken = []
+        while queue and size(queue[0]) <= budget:
+            item = queue.popleft()
+            budget -= size(item)
+            taken.append(item)
+        if queue is not None and not queue:
+            del self._queues[channel_id]
+        return taken
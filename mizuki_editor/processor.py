@@ -1,18 +1,80 @@
 import logging
 from typing import List, Dict, Optional, Union
 from telegram import Message
-from mizuki_editor.editor import Editor
-from util import get_admin_ids
+from util import get_admin_ids, PHASH_MAX_DISTANCE, VIDEO_MATCH_DISTANCE
 from mizuki_editor.hash import _generate_media_hashes, _add_to_hash_data
+from mizuki_editor.hamming import HammingIndex
+from mizuki_editor.video_fingerprint import sequence_distance
 
 logger = logging.getLogger(__name__)
 
 class Processor:
     def __init__(self, hash_data, banned_words, content_checker):
-        self.editor = Editor()
+        self.editor = content_checker.editor
         self.hash_data = hash_data
         self.banned_words = banned_words
         self.content_checker = content_checker
+        self.phash_index = HammingIndex(PHASH_MAX_DISTANCE)
+        # Keyed by (video key, frame number); a re-posted video shares at least
+        # one keyframe within the photo threshold, the rest is scored in full
+        self.video_index = HammingIndex(PHASH_MAX_DISTANCE)
+        # Frames indexed per video key, so a video can be unindexed after its entry is gone
+        self.video_frames: Dict[str, int] = {}
+        self._rebuild_phash_index()
+        self._rebuild_video_index()
+
+    def _rebuild_phash_index(self):
+        """Index every stored photo pHash for near-duplicate search"""
+        for key in self.hash_data.keys('photo'):
+            try:
+                self.phash_index.add(key, key)
+            except ValueError:
+                logger.warning(f"Skipping malformed pHash in hash data: {key}")
+        logger.info(f"Indexed {len(self.phash_index)} photo hashes (max distance {PHASH_MAX_DISTANCE})")
+
+    def _rebuild_video_index(self):
+        """Index the keyframe pHashes of every stored video"""
+        videos = 0
+        for key in self.hash_data.keys('video'):
+            entry = self.hash_data.get(key)
+            frames = entry.get('media', {}).get('frames') if entry else None
+            if frames:
+                self._index_video(key, frames)
+                videos += 1
+        logger.info(f"Indexed keyframes of {videos} videos")
+
+    def _index_video(self, key: str, frames: List[str]):
+        self._unindex_video(key)
+        for i, frame in enumerate(frames):
+            self.video_index.add((key, i), frame)
+        self.video_frames[key] = len(frames)
+
+    def _unindex_video(self, key: str):
+        for i in range(self.video_frames.pop(key, 0)):
+            self.video_index.remove((key, i))
+
+    def clear_hashes(self):
+        """Empty the hash store and both indexes together"""
+        self.hash_data.clear()
+        self.phash_index.clear()
+        self.video_index.clear()
+        self.video_frames.clear()
+
+    def _find_similar_video(self, frames: List[str]) -> Optional[tuple]:
+        """Closest stored (key, mean frame distance) within VIDEO_MATCH_DISTANCE, or None"""
+        candidates = set()
+        for frame in frames:
+            candidates.update(key for (key, _), _ in self.video_index.search_all(frame))
+        best = None
+        for key in candidates:
+            entry = self.hash_data.get(key)
+            if entry is None:
+                self._unindex_video(key)
+                continue
+            distance = sequence_distance(frames, entry['media'].get('frames', []))
+            if distance <= VIDEO_MATCH_DISTANCE and (best is None or distance < best[1]):
+                best = (key, distance)
+        return best
 
     async def process_message(self, message: Message) -> Optional[Union[List[Dict], str]]:
         """Process a message through the content checker pipeline"""
@@ -33,7 +95,41 @@ class Processor:
 
     async def _add_to_hash_data(self, hash_data, caption: str, media_hashes: List[Dict]):
         """Add new media hashes to the hash database"""
-        await _add_to_hash_data(hash_data, caption, media_hashes)
+        evicted = await _add_to_hash_data(hash_data, caption, media_hashes)
+        for media in media_hashes:
+            if media.get('skipped'):
+                continue
+            if media.get('type') == 'photo' and media['phash'] in hash_data:
+                self.phash_index.add(media['phash'], media['phash'])
+            elif media.get('frames') and media['sha256'] in hash_data:
+                self._index_video(media['sha256'], media['frames'])
+        for key in evicted:
+            self.phash_index.remove(key)
+            self._unindex_video(key)
+
+    @staticmethod
+    def _media_key(media: Dict) -> str:
+        return media['phash'] if media['type'] == 'photo' else media['sha256']
+
+    def _is_near_duplicate(self, media: Dict) -> bool:
+        """Search the pHash / keyframe indexes for a stored item close to this one"""
+        media_key = self._media_key(media)
+        if media['type'] == 'photo':
+            match = self.phash_index.search(media_key)
+            while match and match[0] not in self.hash_data:
+                # Cleared from the store behind our back (e.g. /reset hash)
+                self.phash_index.remove(match[0])
+                match = self.phash_index.search(media_key)
+            if match:
+                logger.info(f"Near-duplicate photo detected: {media_key} ~ {match[0]} (distance {match[1]})")
+                return True
+        elif media.get('frames'):
+            match = self._find_similar_video(media['frames'])
+            if match:
+                logger.info(f"Near-duplicate video detected: {media_key} ~ {match[0]} "
+                            f"(mean frame distance {match[1]:.1f})")
+                return True
+        return False
 
     async def _check_duplicates(self, media_hashes: List[Dict]) -> bool:
         """Check if media hashes already exist in our database"""
@@ -45,13 +141,26 @@ class Processor:
             if media.get('skipped'):
                 continue
                 
-            if media['type'] == 'photo':
-                media_key = media['phash']
-            else:
-                media_key = media['sha256']
+            media_key = self._media_key(media)
             
             if media_key in self.hash_data:
                 logger.info(f"Duplicate media detected: {media_key}")
                 return True
 
-        return False
\ No newline at end of file
+            if self._is_near_duplicate(media):
+                return True
+
+        return False
+
+    async def _filter_duplicates(self, media_list: List[Dict]) -> List[Dict]:
+        """The items of a batch that are not duplicates, with one store lookup for all exact keys"""
+        media_list = [media for media in media_list if not media.get('skipped')]
+        existing = self.hash_data.contains_many([self._media_key(media) for media in media_list])
+        valid = []
+        for media in media_list:
+            media_key = self._media_key(media)
+            if media_key in existing:
+                logger.info(f"Duplicate media detected: {media_key}")
+            elif not self._is_near_duplicate(media):
+                valid.append(media)
+        return valid
@@ -0,0 +1,133 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _TokenBucket:
+    """Refills max_calls tokens per period, holding at most `burst`.
+
+    A request larger than the burst is let through once the bucket is full
+    and leaves it in debt, so an album of 10 still gets sent and the next
+    caller waits for the refill.
+    """
+
+    def __init__(self, max_calls: float, period: float, burst: Optional[float]):
+        self.rate = max_calls / period
+        self.capacity = burst if burst is not None else max_calls
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def delay(self, now: float, tokens: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(tokens, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def consume(self, now: float, tokens: float):
+        self.tokens -= tokens
+
+
+class _SlidingWindow:
+    """At most max_calls grants in any `period` seconds, by actual grant time"""
+
+    def __init__(self, max_calls: int, period: float):
+        self.max_calls = max_calls
+        self.period = period
+        self.grants = deque()
+
+    def delay(self, now: float, tokens: float) -> float:
+        while self.grants and now - self.grants[0] >= self.period:
+            self.grants.popleft()
+        allowed = max(0, self.max_calls - min(tokens, self.max_calls))
+        if len(self.grants) <= allowed:
+            return 0.0
+        return self.grants[len(self.grants) - allowed - 1] + self.period - now
+
+    def consume(self, now: float, tokens: float):
+        for _ in range(int(tokens)):
+            self.grants.append(now)
+
+
+class RateLimiter:
+    """Async rate limiter: ``await limiter.acquire()`` or ``async with limiter:``.
+
+    mode is 'token_bucket' (allows bursts up to `burst`) or 'sliding_window'
+    (never more than max_calls in any window). Waiters are served in FIFO
+    order. With a parent, a grant here is followed by a grant from the
+    parent, so a per-chat limiter can sit under a global one.
+    """
+
+    def __init__(self, max_calls: float, period: float, mode: str = 'token_bucket',
+                 burst: Optional[float] = None, parent: Optional['RateLimiter'] = None, name: str = ''):
+        if mode == 'token_bucket':
+            self._policy = _TokenBucket(max_calls, period, burst)
+        elif mode == 'sliding_window':
+            self._policy = _SlidingWindow(int(max_calls), period)
+        else:
+            raise ValueError(f"Unknown rate limiter mode: {mode}")
+        self.mode = mode
+        self.parent = parent
+        self.name = name
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds`, e.g. after a flood wait from Telegram"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: float = 1):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                wait = max(self._paused_until - now, self._policy.delay(now, tokens))
+                if wait <= 0:
+                    self._policy.consume(now, tokens)
+                    break
+                if self.name:
+                    logger.debug(f"Rate limited ({self.name}) - waiting {wait:.2f}s")
+                await asyncio.sleep(wait)
+        if self.parent is not None:
+            await self.parent.acquire(tokens)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class KeyedRateLimiter:
+    """One RateLimiter per key (e.g. per chat), all sharing an optional parent"""
+
+    def __init__(self, max_calls: float, period: float, mode: str = 'token_bucket',
+                 burst: Optional[float] = None, parent: Optional[RateLimiter] = None):
+        self.max_calls = max_calls
+        self.period = period
+        self.mode = mode
+        self.burst = burst
+        self.parent = parent
+        self.limiters: Dict[Hashable, RateLimiter] = {}
+
+    def get(self, key: Hashable) -> RateLimiter:
+        limiter = self.limiters.get(key)
+        if limiter is None:
+            limiter = self.limiters[key] = RateLimiter(
+                self.max_calls, self.period, self.mode, self.burst, self.parent, name=str(key))
+        return limiter
+
+
+_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(name: str, max_calls: float, period: float, mode: str = 'token_bucket',
+                     burst: Optional[float] = None) -> RateLimiter:
+    """Process-wide named limiter, created on first use"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = _limiters[name] = RateLimiter(max_calls, period, mode, burst, name=name)
+    return limiter
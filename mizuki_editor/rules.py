@@ -0,0 +1,129 @@
+import re
+import logging
+from typing import Callable, Dict, List
+from util import (
+    load_remove_words, load_replace_words, load_emoji_replacements, load_preserve_symbols,
+    load_banned_words
+)
+from mizuki_editor.matcher import WordMatcher
+
+logger = logging.getLogger(__name__)
+
+EMOJI_RANGES = (
+    u"\U0001F600-\U0001F64F"  # emoticons
+    u"\U0001F300-\U0001F5FF"  # symbols & pictographs
+    u"\U0001F680-\U0001F6FF"  # transport & map symbols
+    u"\U0001F700-\U0001F77F"  # alchemical symbols
+    u"\U0001F780-\U0001F7FF"  # Geometric Shapes Extended
+    u"\U0001F800-\U0001F8FF"  # Supplemental Arrows-C
+    u"\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
+    u"\U0001FA00-\U0001FA6F"  # Chess Symbols
+    u"\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
+    u"\U00002702-\U000027B0"  # Dingbats
+    u"\U000024C2-\U0001F251"
+)
+
+EMOJI_PATTERN = re.compile("[" + EMOJI_RANGES + "]+", flags=re.UNICODE)
+URL_PATTERN = re.compile(r'https?://\S+')
+HASHTAG_PATTERN = re.compile(r'#\S+')
+
+RULE_LOADERS = (load_remove_words, load_replace_words, load_emoji_replacements, load_preserve_symbols)
+
+
+def _alternation(words) -> str:
+    """Build a regex alternation that prefers the longest key at each position"""
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+class RuleProgram:
+    """Caption rules from the JSON files, compiled once into matchers and regexes"""
+
+    def __init__(self, remove_words: List[str], replace_words: Dict[str, str],
+                 emoji_replacements: Dict[str, str], preserve_symbols: List[str]):
+        self.remove_words = [word for word in remove_words if word]
+        self.replace_words = {k: v for k, v in replace_words.items() if k}
+        self.emoji_replacements = {k: v for k, v in emoji_replacements.items() if k}
+        self.preserve_symbols = set(preserve_symbols)
+
+        self.remove_matcher = WordMatcher(self.remove_words, whole_words=True)
+        # Keys are matched case-insensitively; the first key wins when two
+        # only differ in case.
+        self.replace_matcher = WordMatcher(self.replace_words)
+
+        self.emoji_replace_pattern = None
+        if self.emoji_replacements:
+            self.emoji_replace_pattern = re.compile(_alternation(self.emoji_replacements))
+
+    def replace_emojis(self, text: str) -> str:
+        if not text or self.emoji_replace_pattern is None:
+            return text
+        return self.emoji_replace_pattern.sub(lambda m: self.emoji_replacements[m.group(0)], text)
+
+    def remove_emojis(self, text: str) -> str:
+        if not text:
+            return text
+        if not self.preserve_symbols:
+            return EMOJI_PATTERN.sub('', text)
+        return EMOJI_PATTERN.sub(
+            lambda m: m.group(0) if m.group(0) in self.preserve_symbols else '', text)
+
+    def remove_words_from(self, text: str) -> str:
+        if not text:
+            return text
+        return self.remove_matcher.sub(lambda word, matched: '', text)
+
+    def replace_words_in(self, text: str) -> str:
+        if not text:
+            return text
+        return self.replace_matcher.sub(lambda word, matched: self.replace_words[word], text)
+
+
+def build_rule_program(remove_words, replace_words, emoji_replacements, preserve_symbols) -> RuleProgram:
+    program = RuleProgram(remove_words, replace_words, emoji_replacements, preserve_symbols)
+    logger.info("Compiled caption rules "
+                f"({len(program.remove_words)} remove, "
+                f"{len(program.replace_words)} replace, "
+                f"{len(program.emoji_replacements)} emoji)")
+    return program
+
+
+def build_banned_matcher(banned_words) -> WordMatcher:
+    matcher = WordMatcher(banned_words)
+    logger.info(f"Compiled banned word matcher ({len(matcher)} words)")
+    return matcher
+
+
+class CompiledCache:
+    """Holds a value compiled from config snapshots and rebuilds it when one of them changes.
+
+    The loaders read through util.config, which already decides when a file
+    changed, so a new snapshot object is the signal to recompile.
+    """
+
+    def __init__(self, loaders, build: Callable):
+        self.loaders = tuple(loaders)
+        self.build = build
+        self._sources = None
+        self._value = None
+
+    def get(self):
+        sources = tuple(load() for load in self.loaders)
+        if self._sources is None or not all(
+                new is old or new == old for new, old in zip(sources, self._sources)):
+            self._value = self.build(*sources)
+            self._sources = sources
+        return self._value
+
+
+class RuleCache(CompiledCache):
+    """The RuleProgram for the caption rule files"""
+
+    def __init__(self):
+        super().__init__(RULE_LOADERS, build_rule_program)
+
+
+class BannedWordCache(CompiledCache):
+    """The WordMatcher for banned.json"""
+
+    def __init__(self):
+        super().__init__((load_banned_words,), build_banned_matcher)
@@ -0,0 +1,94 @@
+import zlib
+import asyncio
+import itertools
+import logging
+from typing import Hashable, List, Union
+from telegram import Message, Update
+
+logger = logging.getLogger(__name__)
+
+
+class MediaGroupJob:
+    """A complete media group handed back to the shard its parts came through"""
+
+    def __init__(self, group_id: Hashable, messages: List[Message]):
+        self.group_id = group_id
+        self.messages = messages
+
+    @property
+    def message(self) -> Message:
+        return self.messages[0]
+
+
+def update_sort_key(update: Union[Update, MediaGroupJob]):
+    """Oldest message first; album parts share a date, so the message id keeps them in order"""
+    message = update.message
+    if message is None:
+        return (0, 0)
+    timestamp = message.date.timestamp() if message.date else 0
+    return (timestamp, message.message_id)
+
+
+class UpdateScheduler:
+    """Priority queue of forwarded updates ordered by message date.
+
+    Push and pop are O(log n) and several workers can await get() at once.
+    A sequence number breaks ties so equal keys keep their arrival order.
+    """
+
+    def __init__(self):
+        self._queue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self.pending = 0
+
+    def put(self, update: Update):
+        self.pending += 1
+        self._queue.put_nowait((update_sort_key(update), next(self._seq), update))
+
+    async def get(self) -> Update:
+        _, _, update = await self._queue.get()
+        return update
+
+    def task_done(self):
+        """Mark the update from get() finished; pending counts queued plus in-progress updates"""
+        self.pending -= 1
+        self._queue.task_done()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+
+class ShardedScheduler:
+    """One UpdateScheduler per worker.
+
+    Every part of a media group lands on the same shard so one worker sees
+    the whole album in order; other updates go to the least busy worker.
+    """
+
+    def __init__(self, shards: int):
+        self.shards = [UpdateScheduler() for _ in range(max(1, shards))]
+
+    def _group_shard(self, group_id: Hashable) -> UpdateScheduler:
+        return self.shards[zlib.crc32(str(group_id).encode()) % len(self.shards)]
+
+    def _shard_for(self, update: Update) -> UpdateScheduler:
+        message = update.message
+        if message is not None and message.media_group_id:
+            return self._group_shard(message.media_group_id)
+        return min(self.shards, key=lambda shard: shard.pending)
+
+    def put(self, update: Update):
+        self._shard_for(update).put(update)
+
+    def put_group(self, group_id: Hashable, messages: List[Message]):
+        """Queue a completed media group on the shard that received its parts"""
+        self._group_shard(group_id).put(MediaGroupJob(group_id, messages))
+
+    def shard(self, index: int) -> UpdateScheduler:
+        return self.shards[index]
+
+    def qsize(self) -> int:
+        return sum(shard.qsize() for shard in self.shards)
@@ -0,0 +1,34 @@
+import re
+from summa import summarizer
+
+
+def summarize_text(text):
+    word_count = len(text.split())
+    if word_count <= 151:
+        return text
+    summary = summarizer.summarize(text, words=200)
+    if not summary:
+        return text
+
+    sentences = re.split(r'(?<=[.!?])\s+', summary)
+    sentences = [s.strip() for s in sentences if s.strip()]
+
+    paragraphs = []
+    current_para = []
+    current_words = 0
+
+    for sentence in sentences:
+        sentence_words = len(sentence.split())
+        if current_words + sentence_words > 20:
+    
+            paragraphs.append(' '.join(current_para))
+            current_para = []
+            current_words = 0
+        current_para.append(sentence)
+        current_words += sentence_words
+
+    if current_para:
+        paragraphs.append(' '.join(current_para))
+
+    formatted_summary = '\n\n'.join(paragraphs)
+    return formatted_summary.strip()
@@ -0,0 +1,148 @@
+import os
+import json
+import atexit
+import asyncio
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+from util import TRANSLATION_CACHE_FILE, TRANSLATION_CACHE_MAX_ENTRIES, TRANSLATION_CACHE_TTL, atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so cross-posted copies of a caption share one cache key"""
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+def make_cache_key(text: str, target: str) -> str:
+    return hashlib.sha256(f"{target}\n{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """Bounded LRU of translations with a TTL, persisted to a JSON file"""
+
+    def __init__(self, path: str = TRANSLATION_CACHE_FILE, max_entries: int = TRANSLATION_CACHE_MAX_ENTRIES,
+                 ttl: int = TRANSLATION_CACHE_TTL, save_interval: int = 30, stats_interval: int = 100):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.save_interval = save_interval
+        self.stats_interval = stats_interval
+        self.entries: "OrderedDict[str, list]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._last_save = time.time()
+        self._saving = False
+        self._lock = threading.Lock()
+        # Serializes writers so an older snapshot can't be renamed over a newer one
+        self._write_lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Load cached translations, dropping expired entries"""
+        try:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            for key, (translated, timestamp) in data.items():
+                if now - timestamp < self.ttl:
+                    self.entries[key] = [translated, timestamp]
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            logger.info(f"Loaded {len(self.entries)} cached translations")
+        except Exception as e:
+            logger.error(f"Error loading translation cache: {e}")
+            self.entries = OrderedDict()
+
+    def get(self, text: str, target: str = 'en') -> Optional[str]:
+        key = make_cache_key(text, target)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[1] >= self.ttl:
+                del self.entries[key]
+                self._dirty = True
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            lookups = self.hits + self.misses
+        if lookups % self.stats_interval == 0:
+            logger.info(f"Translation cache: {self.hits}/{lookups} hits "
+                        f"({self.hit_ratio:.1%}), {len(self.entries)} entries")
+        return entry[0] if entry is not None else None
+
+    def put(self, text: str, translated: str, target: str = 'en'):
+        key = make_cache_key(text, target)
+        with self._lock:
+            self.entries[key] = [translated, int(time.time())]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._dirty = True
+            due = not self._saving and time.time() - self._last_save >= self.save_interval
+            if due:
+                self._saving = True
+        if due:
+            self._save_in_background()
+
+    def _save_in_background(self):
+        """Flush on a worker thread so a cache miss never rewrites the file on the event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Called from a thread (translate_text); that thread can afford the write
+            self.flush()
+            return
+        loop.run_in_executor(None, self.flush)
+
+    def flush(self):
+        """Write the cache to disk if it changed since the last save"""
+        with self._write_lock:
+            try:
+                with self._lock:
+                    if not self._dirty:
+                        return
+                    data = dict(self.entries)
+                    self._dirty = False
+                    self._last_save = time.time()
+                atomic_write_json(self.path, data, ensure_ascii=False)
+            except Exception as e:
+                logger.error(f"Error saving translation cache: {e}")
+            finally:
+                self._saving = False
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hit_ratio,
+            'entries': len(self.entries),
+        }
+
+
+_translation_cache: Optional[TranslationCache] = None
+
+
+def get_translation_cache() -> TranslationCache:
+    """The process-wide translation cache; two instances on one file would overwrite each other"""
+    global _translation_cache
+    if _translation_cache is None:
+        _translation_cache = TranslationCache()
+        # put() only saves every save_interval seconds; keep the tail across restarts
+        atexit.register(_translation_cache.flush)
+    return _translation_cache
@@ -0,0 +1,133 @@
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import Dict, List
+import imagehash
+from PIL import Image
+from imageio_ffmpeg import get_ffmpeg_exe
+from util import (
+    VIDEO_HASH_CHUNK_SIZE, VIDEO_HASH_SAMPLE_SIZE, VIDEO_FINGERPRINT_FRAMES, VIDEO_DECODE_TIMEOUT
+)
+from mizuki_editor.download import download_range
+
+logger = logging.getLogger(__name__)
+
+FRAME_SIZE = 32
+
+
+def _is_flat(frame_hash: imagehash.ImageHash) -> bool:
+    """Black, white or single-colour frames carry no signal and match each other"""
+    bits = int(frame_hash.hash.sum())
+    return bits <= 2 or bits >= frame_hash.hash.size - 2
+
+
+async def fingerprint_video(path: str, max_frames: int = VIDEO_FINGERPRINT_FRAMES,
+                            timeout: float = VIDEO_DECODE_TIMEOUT) -> List[str]:
+    """pHash of up to max_frames keyframes, decoded by ffmpeg straight to 32x32 grayscale"""
+    cmd = [
+        get_ffmpeg_exe(), '-v', 'error', '-nostdin',
+        '-skip_frame', 'nokey', '-i', path,
+        '-an', '-vf', f'scale={FRAME_SIZE}:{FRAME_SIZE},format=gray', '-vsync', 'vfr',
+        '-frames:v', str(max_frames), '-f', 'rawvideo', '-',
+    ]
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        logger.warning(f"Keyframe decode timed out after {timeout}s")
+        return []
+
+    frame_bytes = FRAME_SIZE * FRAME_SIZE
+    frames = []
+    for offset in range(0, len(stdout) - frame_bytes + 1, frame_bytes):
+        image = Image.frombytes('L', (FRAME_SIZE, FRAME_SIZE), stdout[offset:offset + frame_bytes])
+        frame_hash = imagehash.phash(image)
+        if not _is_flat(frame_hash):
+            frames.append(str(frame_hash))
+    if not frames and stderr:
+        # Expected for a prefix whose container index is at the end of the file
+        logger.debug(f"No keyframes decoded: {stderr.decode(errors='replace').strip()[:200]}")
+    return frames
+
+
+async def fingerprint_bytes(data: bytes, max_frames: int = VIDEO_FINGERPRINT_FRAMES) -> List[str]:
+    """fingerprint_video for an in-memory (possibly truncated) file"""
+    fd, path = tempfile.mkstemp(suffix='.mp4')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            await asyncio.to_thread(f.write, data)
+        return await fingerprint_video(path, max_frames)
+    finally:
+        os.remove(path)
+
+
+def _append(path: str, data: bytes):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+async def fingerprint_telegram_video(file, max_frames: int = VIDEO_FINGERPRINT_FRAMES,
+                                     chunk_size: int = VIDEO_HASH_CHUNK_SIZE,
+                                     sample_size: int = VIDEO_HASH_SAMPLE_SIZE) -> Dict:
+    """Digests and keyframe hashes of a video from a bounded prefix of the file.
+
+    Downloads chunk_size bytes, then doubles the prefix until max_frames
+    keyframes decode or sample_size is reached. sha256/md5 cover the first
+    chunk plus the file size, so they stay stable however much was fetched.
+    Files whose prefix cannot be decoded (index at the end) are fetched whole.
+    """
+    total = file.file_size or sample_size
+    head = b''
+    fetched = 0
+    limit = min(chunk_size, total)
+    fd, prefix_path = tempfile.mkstemp(suffix='.mp4')
+    os.close(fd)
+    try:
+        # Each step appends only the new range to the prefix file, off the event loop
+        while True:
+            data = await download_range(file, fetched, limit, chunk_size)
+            if len(head) < chunk_size:
+                head += data[:chunk_size - len(head)]
+            await asyncio.to_thread(_append, prefix_path, data)
+            fetched += len(data)
+            frames = await fingerprint_video(prefix_path, max_frames)
+            if len(frames) >= max_frames or fetched >= min(total, sample_size) or fetched < limit:
+                break
+            limit = min(limit * 2, sample_size, total)
+    finally:
+        os.remove(prefix_path)
+
+    if not frames and fetched < total:
+        logger.info(f"Video prefix undecodable, downloading full file ({total/1_000_000:.1f}MB)")
+        file_path = await file.download_to_drive()
+        try:
+            frames = await fingerprint_video(str(file_path), max_frames)
+        finally:
+            os.remove(file_path)
+
+    head += str(file.file_size or fetched).encode()
+    return {
+        'sha256': hashlib.sha256(head).hexdigest(),
+        'md5': hashlib.md5(head).hexdigest(),
+        'frames': frames,
+    }
+
+
+def sequence_distance(a: List[str], b: List[str]) -> float:
+    """Mean Hamming distance from each frame of the shorter sequence to its closest frame in the other.
+
+    Matching each frame to its nearest neighbour rather than by position
+    tolerates trims and the shifted keyframes a re-encode produces.
+    """
+    if not a or not b:
+        return float('inf')
+    if len(a) > len(b):
+        a, b = b, a
+    xs = [int(h, 16) for h in a]
+    ys = [int(h, 16) for h in b]
+    return sum(min((x ^ y).bit_count() for y in ys) for x in xs) / len(xs)
@@ -0,0 +1,276 @@
+import time
+import signal
+import asyncio
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Awaitable, Callable, Dict, List, Optional
+from util import HEALTH_PING_INTERVAL, HEALTH_TIMEOUT, SHUTDOWN_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+RESTART_DELAY = 10
+MAX_RESTART_DELAY = 300
+# A component that stayed up this long is healthy again and restarts from the base delay
+HEALTHY_UPTIME = 300
+
+
+class Component:
+    """One supervised coroutine and its restart policy.
+
+    max_restarts=None restarts forever; the delay doubles after each
+    failure up to max_restart_delay and resets once a run has lasted
+    healthy_uptime seconds.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Awaitable], max_restarts: Optional[int] = None,
+                 restart_delay: float = RESTART_DELAY, max_restart_delay: float = MAX_RESTART_DELAY,
+                 healthy_uptime: float = HEALTHY_UPTIME):
+        self.name = name
+        self.factory = factory
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.healthy_uptime = healthy_uptime
+        self.restarts = 0
+        self.started_at = 0.0
+
+
+class Supervisor:
+    """Runs components as tasks on one event loop and restarts each one on its own.
+
+    A component that crashes or returns while the supervisor is running is
+    restarted without touching the others, so a failing bot does not take
+    the user-session client or the monitors down with it. run() returns once
+    every component has used up its restarts.
+    """
+
+    def __init__(self):
+        self.running = False
+        self.components: List[Component] = []
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._stopped: Optional[asyncio.Event] = None
+
+    def add(self, name: str, factory: Callable[[], Awaitable], **policy) -> Component:
+        component = Component(name, factory, **policy)
+        self.components.append(component)
+        return component
+
+    async def _supervise(self, component: Component):
+        delay = component.restart_delay
+        while self.running:
+            component.started_at = time.monotonic()
+            try:
+                logger.info(f"Starting {component.name}")
+                await component.factory()
+                if not self.running:
+                    break
+                logger.error(f"{component.name} stopped unexpectedly")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{component.name} crashed: {e}", exc_info=True)
+
+            if time.monotonic() - component.started_at >= component.healthy_uptime:
+                delay = component.restart_delay
+            component.restarts += 1
+            if component.max_restarts is not None and component.restarts > component.max_restarts:
+                logger.error(f"Max restart attempts reached for {component.name}")
+                break
+            logger.info(f"Restarting {component.name} in {delay:.0f} seconds... (restart {component.restarts})")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, component.max_restart_delay)
+
+        current = asyncio.current_task()
+        if self.running and all(task.done() or task is current for task in self.tasks.values()):
+            # Nothing left to supervise; return from run() so a child process exits and
+            # its ProcessSupervisor restarts it instead of seeing healthy pings forever
+            logger.error("All components have stopped")
+            self.stop()
+
+    async def run(self):
+        """Start every component and wait until stop() is called"""
+        self.running = True
+        self._stopped = asyncio.Event()
+        for component in self.components:
+            self.tasks[component.name] = asyncio.create_task(
+                self._supervise(component), name=component.name)
+        try:
+            await self._stopped.wait()
+        finally:
+            await self._shutdown()
+
+    def stop(self):
+        self.running = False
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def _shutdown(self):
+        self.running = False
+        for task in self.tasks.values():
+            task.cancel()
+        results = await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        for name, result in zip(self.tasks, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error stopping {name}: {result}")
+        self.tasks.clear()
+
+
+async def _child_main(factory: Callable[[], Awaitable], conn: Connection, ping_interval: float):
+    """Run a component in a child process, pinging the parent from its event loop"""
+    main = asyncio.create_task(factory())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, main.cancel)
+
+    async def ping():
+        # A loop stuck in blocking code stops pinging, which the parent treats as a hang
+        while True:
+            try:
+                conn.send(time.time())
+            except OSError:
+                # The supervisor is gone; do not keep running as an orphan
+                main.cancel()
+                return
+            await asyncio.sleep(ping_interval)
+
+    pinger = asyncio.create_task(ping())
+    try:
+        await main
+    except asyncio.CancelledError:
+        pass
+    finally:
+        pinger.cancel()
+        conn.close()
+
+
+def _run_child(factory: Callable[[], Awaitable], conn: Connection, ping_interval: float):
+    asyncio.run(_child_main(factory, conn, ping_interval))
+
+
+class ProcessSupervisor:
+    """Runs each component in its own process and restarts it when it exits or hangs.
+
+    Children ping the parent every ping_interval seconds over a pipe; one
+    that stays silent for health_timeout is killed and restarted under the
+    same policy as a crash. stop() sends SIGTERM so children can shut down
+    cleanly and kills whatever is still running after shutdown_timeout.
+    Factories must be module-level async functions so they can be pickled
+    into a spawned process.
+    """
+
+    def __init__(self, ping_interval: float = HEALTH_PING_INTERVAL, health_timeout: float = HEALTH_TIMEOUT,
+                 shutdown_timeout: float = SHUTDOWN_TIMEOUT):
+        self.running = False
+        self.ping_interval = ping_interval
+        self.health_timeout = health_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.components: List[Component] = []
+        self.processes: Dict[str, multiprocessing.Process] = {}
+        self.pipes: Dict[str, Connection] = {}
+        self.last_ping: Dict[str, float] = {}
+        self.restart_at: Dict[str, float] = {}
+        self.delays: Dict[str, float] = {}
+        self._context = multiprocessing.get_context('spawn')
+
+    def add(self, name: str, factory: Callable[[], Awaitable], **policy) -> Component:
+        component = Component(name, factory, **policy)
+        self.components.append(component)
+        self.delays[name] = component.restart_delay
+        return component
+
+    def _start(self, component: Component):
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_run_child, args=(component.factory, sender, self.ping_interval),
+            name=component.name, daemon=False)
+        process.start()
+        sender.close()
+        component.started_at = time.monotonic()
+        self.processes[component.name] = process
+        self.pipes[component.name] = receiver
+        self.last_ping[component.name] = time.monotonic()
+        logger.info(f"Started {component.name} (pid {process.pid})")
+
+    def _drain_pings(self, name: str):
+        pipe = self.pipes[name]
+        try:
+            while pipe.poll():
+                pipe.recv()
+                self.last_ping[name] = time.monotonic()
+        except (EOFError, OSError):
+            pass
+
+    def _reap(self, component: Component, reason: str):
+        """Schedule a restart for a component whose process is gone or has been killed"""
+        name = component.name
+        self.processes.pop(name).join()
+        self.pipes.pop(name).close()
+        if not self.running:
+            return
+        logger.error(f"{name} {reason}")
+
+        if time.monotonic() - component.started_at >= component.healthy_uptime:
+            self.delays[name] = component.restart_delay
+        component.restarts += 1
+        if component.max_restarts is not None and component.restarts > component.max_restarts:
+            logger.error(f"Max restart attempts reached for {name}")
+            return
+        delay = self.delays[name]
+        logger.info(f"Restarting {name} in {delay:.0f} seconds... (restart {component.restarts})")
+        self.restart_at[name] = time.monotonic() + delay
+        self.delays[name] = min(delay * 2, component.max_restart_delay)
+
+    def _check(self, component: Component):
+        name = component.name
+        process = self.processes.get(name)
+        if process is None:
+            restart_at = self.restart_at.get(name)
+            if restart_at is not None and time.monotonic() >= restart_at:
+                del self.restart_at[name]
+                self._start(component)
+            return
+
+        self._drain_pings(name)
+        if not process.is_alive():
+            self._reap(component, f"exited with code {process.exitcode}")
+        elif time.monotonic() - self.last_ping[name] > self.health_timeout:
+            logger.error(f"{name} missed health pings for {self.health_timeout:.0f}s, killing it")
+            process.kill()
+            self._reap(component, "was unresponsive")
+
+    def run(self):
+        """Start every component and supervise them until SIGINT or SIGTERM"""
+        self.running = True
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: self.stop())
+        for component in self.components:
+            self._start(component)
+        try:
+            while self.running:
+                for component in self.components:
+                    self._check(component)
+                time.sleep(1)
+        finally:
+            self._shutdown()
+
+    def stop(self):
+        self.running = False
+
+    def _shutdown(self):
+        self.running = False
+        for name, process in self.processes.items():
+            if process.is_alive():
+                logger.info(f"Stopping {name}...")
+                process.terminate()
+        deadline = time.monotonic() + self.shutdown_timeout
+        for name, process in self.processes.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"{name} did not stop within {self.shutdown_timeout:.0f}s, killing it")
+                process.kill()
+                process.join()
+        for pipe in self.pipes.values():
+            pipe.close()
+        self.processes.clear()
+        self.pipes.clear()
@@ -2,8 +2,14 @@ import os
 from dotenv import load_dotenv
 import json
 import re
+import time
 import random
-from typing import List,Union,Dict,Any
+import fcntl
+import tempfile
+import functools
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import List,Union,Dict,Any,Callable,FrozenSet,Optional,Tuple
 
 
 load_dotenv()
@@ -15,6 +21,11 @@ MAX_PHOTO_SIZE = 50_000_000
 MAX_VIDEO_SIZE = 150_000_000  
 VIDEO_HASH_CHUNK_SIZE = 2_000_000  
 VIDEO_HASH_SAMPLE_SIZE = 20_000_000 
+# Videos are fingerprinted by the pHashes of up to this many keyframes
+VIDEO_FINGERPRINT_FRAMES = int(os.getenv("VIDEO_FINGERPRINT_FRAMES", "16"))
+# Mean per-frame bit distance under which two videos count as duplicates
+VIDEO_MATCH_DISTANCE = int(os.getenv("VIDEO_MATCH_DISTANCE", "10"))
+VIDEO_DECODE_TIMEOUT = float(os.getenv("VIDEO_DECODE_TIMEOUT", "30"))
 
 
 
@@ -31,7 +42,51 @@ SOURCE_FILE = os.path.join(JSON_FOLDER, "source_id.json")
 HASH_FILE = os.path.join(JSON_FOLDER, "hash.json")
 BAN_FILE = os.path.join(JSON_FOLDER, "banned.json")
 RECOVERY_FILE = os.path.join(JSON_FOLDER, "last_message_id.json")
-MAX_HASH_ENTRIES = 1000
+TRANSLATION_CACHE_FILE = os.path.join(JSON_FOLDER, "translation_cache.json")
+ENTITY_CACHE_FILE = os.path.join(JSON_FOLDER, "entities.json")
+HASH_DB_FILE = os.path.join(JSON_FOLDER, "hash.db")
+# "sqlite" (indexed, scales to large histories) or "json" (the old hash.json)
+HASH_STORE_BACKEND = os.getenv("HASH_STORE_BACKEND", "sqlite")
+MAX_HASH_ENTRIES = int(os.getenv("MAX_HASH_ENTRIES", "100000" if HASH_STORE_BACKEND == "sqlite" else "1000"))
+# Photos whose pHashes differ in at most this many bits count as duplicates
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+TRANSLATION_CACHE_MAX_ENTRIES = 5000
+TRANSLATION_CACHE_TTL = 7 * 24 * 3600
+
+# Blocking caption stages run off the event loop; pool kind is "thread" or "process"
+TRANSLATE_POOL = os.getenv("TRANSLATE_POOL", "thread")
+TRANSLATE_WORKERS = int(os.getenv("TRANSLATE_WORKERS", "4"))
+TRANSLATE_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT", "30"))
+SUMMARIZE_POOL = os.getenv("SUMMARIZE_POOL", "process")
+SUMMARIZE_WORKERS = int(os.getenv("SUMMARIZE_WORKERS", "2"))
+SUMMARIZE_TIMEOUT = float(os.getenv("SUMMARIZE_TIMEOUT", "20"))
+MEDIA_HASH_POOL = os.getenv("MEDIA_HASH_POOL", "process")
+MEDIA_HASH_WORKERS = int(os.getenv("MEDIA_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+MEDIA_HASH_TIMEOUT = float(os.getenv("MEDIA_HASH_TIMEOUT", "30"))
+# Bytes of photo data held in memory across all downloads in flight
+DOWNLOAD_MEMORY_BUDGET = int(os.getenv("DOWNLOAD_MEMORY_BUDGET", str(64_000_000)))
+# Album parts downloaded and hashed at the same time
+MEDIA_GROUP_FANOUT = int(os.getenv("MEDIA_GROUP_FANOUT", "5"))
+
+# Source channel ingestion: "events" (updates + periodic gap-fill poll) or "poll"
+MONITOR_MODE = os.getenv("MONITOR_MODE", "events")
+MONITOR_GAP_FILL_INTERVAL = int(os.getenv("MONITOR_GAP_FILL_INTERVAL", "300"))
+
+# Workers draining forwarded updates in the editor bot
+EDITOR_WORKERS = int(os.getenv("EDITOR_WORKERS", "3"))
+
+# Seconds between write-behind flushes of channel checkpoints
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", "5"))
+
+# "single": every component on one event loop; "processes": one process per component group
+DEPLOY_MODE = os.getenv("DEPLOY_MODE", "single")
+HEALTH_PING_INTERVAL = float(os.getenv("HEALTH_PING_INTERVAL", "5"))
+# A component process that has not pinged for this long is killed and restarted
+HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "60"))
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "20"))
+
+# Cached config files are stat()ed for changes at most this often
+CONFIG_CHECK_INTERVAL = float(os.getenv("CONFIG_CHECK_INTERVAL", "1"))
 
 for file in [
     BAN_FILE,
@@ -49,6 +104,115 @@ for file in [REPLACE_FILE, HASH_FILE,RECOVERY_FILE,EMOJI_FILE]:
         with open(file, "w") as f:
             json.dump({}, f)
 
+def atomic_write_json(path: str, data: Any, **dump_kwargs):
+    """Write JSON to a temp file, fsync it and rename it over path, so readers never see a partial file"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive lock on path + '.lock', shared with every process that edits path"""
+    with open(path + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _freeze(value):
+    """Read-only copy of parsed JSON: lists become tuples, dicts mapping proxies"""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+
+def _thaw(value):
+    """Plain JSON-serializable copy of a snapshot: tuples become lists, mapping proxies dicts"""
+    if isinstance(value, (list, tuple)):
+        return [_thaw(item) for item in value]
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+class ConfigRegistry:
+    """JSON config files parsed once and served from memory as immutable snapshots.
+
+    A file is parsed again only when its mtime or size changes, and it is
+    stat()ed at most every check_interval seconds, so edits made by another
+    process show up within that interval. write() replaces the file and the
+    cached snapshot together. Snapshots are read-only; copy one (list(...),
+    dict(...)) before changing it.
+    """
+
+    def __init__(self, check_interval: float = CONFIG_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        # path -> (file signature, monotonic time of the last check, snapshot)
+        self._entries: Dict[str, Tuple[Optional[Tuple[int, int]], float, Any]] = {}
+
+    def get(self, path: str, load: Callable[[str], Any]):
+        """Snapshot of path, calling load(path) only when the file changed since the last load"""
+        now = time.monotonic()
+        entry = self._entries.get(path)
+        if entry is not None and now - entry[1] < self.check_interval:
+            return entry[2]
+        signature = _file_signature(path)
+        if entry is not None and signature == entry[0]:
+            self._entries[path] = (signature, now, entry[2])
+            return entry[2]
+        value = _freeze(load(path))
+        self._entries[path] = (signature, now, value)
+        return value
+
+    def write(self, path: str, data: Any, **dump_kwargs):
+        """Atomically write data to path and make it the cached snapshot"""
+        # Snapshots from get() may be passed straight back in
+        data = _thaw(data)
+        atomic_write_json(path, data, **dump_kwargs)
+        self._entries[path] = (_file_signature(path), time.monotonic(), _freeze(data))
+
+    def update(self, path: str, load: Callable[[str], Any], mutate: Callable[[Any], Any], **dump_kwargs):
+        """Read-modify-write path under file_lock, so edits from other processes are not lost.
+
+        mutate gets a freshly loaded, mutable copy and returns the data to
+        write; the new snapshot is returned.
+        """
+        with file_lock(path):
+            data = mutate(load(path))
+            self.write(path, data, **dump_kwargs)
+            return self._entries[path][2]
+
+    def invalidate(self, path: str):
+        self._entries.pop(path, None)
+
+
+config = ConfigRegistry()
+
+
 def get_dump_channel_id() -> int:
     channel_id = os.getenv("DUMP_CHANNEL_ID")
     if not channel_id:
@@ -61,57 +225,80 @@ def get_vid_channel_id() -> int:
         raise ValueError("VID_CHANNEL_ID not found in .env file")
     return int(channel_id)
 
-def get_target_channel() -> List[int]:
-    if not os.path.exists(TARGET_FILE):
+def _read_target_channels(path: str) -> List[int]:
+    if not os.path.exists(path):
         raise ValueError("No target channel configured (file missing).")
-    
-    with open(TARGET_FILE, 'r') as f:
+
+    with open(path, 'r') as f:
         channels = json.load(f)
-    
+
+    return [int(channel) for channel in channels]
+
+def load_target_channels() -> Tuple[int, ...]:
+    """Forward targets, possibly none yet"""
+    return config.get(TARGET_FILE, _read_target_channels)
+
+def get_target_channel() -> Tuple[int, ...]:
+    channels = load_target_channels()
+
     if not channels:
         raise ValueError("No target channel configured (empty list).")
-    
-    return [int(channel) for channel in channels]  
 
-def add_target_channel(channel_id: int):
+    return channels
+
+def _add_channel(path: str, load: Callable[[str], List[int]], channel_id: int, **dump_kwargs) -> bool:
+    """Append channel_id to a channel list file under its lock; False if it was already there"""
+    added = False
+
+    def mutate(channels):
+        nonlocal added
+        if channel_id not in channels:
+            channels.append(channel_id)
+            added = True
+        return channels
+
+    config.update(path, load, mutate, **dump_kwargs)
+    return added
+
+def _remove_channels(path: str, load: Callable[[str], List[int]], channel_ids, **dump_kwargs) -> Tuple[int, ...]:
+    """Drop channel_ids from a channel list file under its lock, returning the channels left"""
+    removed = set(channel_ids)
+    return config.update(path, load, lambda channels: [c for c in channels if c not in removed], **dump_kwargs)
+
+def add_target_channel(channel_id: int) -> bool:
     """Add new forward target"""
-    channels = get_target_channel()
-    if channel_id not in channels:
-        channels.append(channel_id)
-        with open(TARGET_FILE, 'w') as f:
-            json.dump(channels, f)
+    return _add_channel(TARGET_FILE, _read_target_channels, channel_id)
 
 def remove_target_channel(channel_id: int):
     """Remove forward target"""
-    channels = get_target_channel()
-    if channel_id in channels:
-        channels.remove(channel_id)
-        with open(TARGET_FILE, 'w') as f:
-            json.dump(channels, f)
-            
-def load_banned_words():
-    with open(BAN_FILE, "r") as f:
+    _remove_channels(TARGET_FILE, _read_target_channels, [channel_id])
+
+def _read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def load_banned_words() -> Tuple[str, ...]:
+    return config.get(BAN_FILE, _read_json)
+
 def save_banned_words(words):
-    with open(BAN_FILE, "w") as f:
-        json.dump(words, f)
+    config.write(BAN_FILE, words)
 
 
-def load_remove_words() -> List[str]:
-    try:
-        os.makedirs(JSON_FOLDER, exist_ok=True)
+def _read_remove_words(path: str) -> List[str]:
+    if not os.path.exists(path):
+        return []
 
-        if not os.path.exists(REMOVE_FILE):
-            return []
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
 
-        with open(REMOVE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    if isinstance(data, list):
+        return data
+    return data.get("words", [])
 
-            if isinstance(data, list):
-                return data
-            return data.get("words", [])
 
+def load_remove_words() -> Tuple[str, ...]:
+    try:
+        return config.get(REMOVE_FILE, _read_remove_words)
     except json.JSONDecodeError:
         print(f"Warning: {REMOVE_FILE} contains invalid JSON")
         return []
@@ -126,8 +313,7 @@ def generate_post_id():
 
 def save_remove_words(words):
     os.makedirs(JSON_FOLDER, exist_ok=True)
-    with open(REMOVE_FILE, "w") as f:
-        json.dump(words, f, indent=2)
+    config.write(REMOVE_FILE, words, indent=2)
 
 
 def get_bot_token():
@@ -143,14 +329,23 @@ def get_bot_token_2():
         raise ValueError("BOT_TOKEN not found in .env file")
     return token
 
+def _read_json_or(default):
+    """Loader for config.get() that yields default while the file does not exist"""
+    def load(path: str):
+        if not os.path.exists(path):
+            return default
+        return _read_json(path)
+    return load
+
+
+_read_json_dict = _read_json_or({})
+_read_json_list = _read_json_or([])
+
+
 def load_replace_words():
     """Load word replacements from JSON file"""
     try:
-        if not os.path.exists(REPLACE_FILE):
-            return {}
-
-        with open(REPLACE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return config.get(REPLACE_FILE, _read_json_dict)
     except Exception as e:
         print(f"Error loading replace words: {e}")
         return {}
@@ -160,8 +355,7 @@ def save_replace_words(replace_dict):
     """Save word replacements to JSON file"""
     try:
         os.makedirs(JSON_FOLDER, exist_ok=True)
-        with open(REPLACE_FILE, "w", encoding="utf-8") as f:
-            json.dump(replace_dict, f, ensure_ascii=False, indent=2)
+        config.write(REPLACE_FILE, replace_dict, ensure_ascii=False, indent=2)
         return True
     except Exception as e:
         print(f"Error saving replace words: {e}")
@@ -203,63 +397,85 @@ def get_bot_username():
     return username.lstrip("@")
 
 
-def load_channels():
-    if not os.path.exists(SOURCE_FILE):
+def _read_channels(path: str) -> List[int]:
+    if not os.path.exists(path):
         return []
-    with open(SOURCE_FILE, "r") as f:
+    with open(path, "r") as f:
         data = json.load(f)
     return [int(cid) for cid in data]
 
 
+def load_channels() -> Tuple[int, ...]:
+    return config.get(SOURCE_FILE, _read_channels)
+
+
 def save_channels(channel_list):
     os.makedirs(JSON_FOLDER, exist_ok=True)
-    with open(SOURCE_FILE, "w") as f:
-        json.dump(channel_list, f, indent=2)
+    # The channel monitor may run in another process and reloads this file on change
+    with file_lock(SOURCE_FILE):
+        config.write(SOURCE_FILE, [int(cid) for cid in channel_list], indent=2)
+
+
+# /a, /r and the channel monitor edit the source list from different processes;
+# these hold the file lock across the read-modify-write instead of saving a stale copy
+def add_source_channel(channel_id: int) -> bool:
+    return _add_channel(SOURCE_FILE, _read_channels, channel_id, indent=2)
+
 
+def remove_source_channels(channel_ids) -> Tuple[int, ...]:
+    return _remove_channels(SOURCE_FILE, _read_channels, channel_ids, indent=2)
 
-def get_admin_ids():
-    """Get list of admin user IDs from environment"""
+
+@functools.lru_cache(maxsize=None)
+def get_admin_ids() -> FrozenSet[int]:
+    """Admin user IDs from the environment, parsed once"""
     admin_ids = os.getenv('ADMIN_IDS', '').split(',')
-    return [int(id.strip()) for id in admin_ids if id.strip().isdigit()]
+    return frozenset(int(id.strip()) for id in admin_ids if id.strip().isdigit())
+
+MARKDOWN_V2_ESCAPE_CHARS = r'_*[]()~`>#+-=|{}.!'
+MARKDOWN_V2_PATTERN = re.compile(f'([{"".join(re.escape(c) for c in MARKDOWN_V2_ESCAPE_CHARS)}])')
 
 def escape_markdown_v2(text: str) -> str:
     """Escape all special Markdown V2 characters"""
     if not text:
         return ""
     
-    escape_chars = r'_*[]()~`>#+-=|{}.!'
-    
-    pattern = f'([{"".join(re.escape(c) for c in escape_chars)}])'
-    
-    return re.sub(pattern, r'\\\1', text)
+    return MARKDOWN_V2_PATTERN.sub(r'\\\1', text)
 
 def load_emoji_replacements():
     """Load emoji replacements from JSON file"""
     try:
-        if os.path.exists(EMOJI_FILE):
-            with open(EMOJI_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        return config.get(EMOJI_FILE, _read_json_dict)
     except Exception as e:
         logger.error(f"Failed to load emoji replacements: {e}")
         return {}
-    
-def load_preserve_symbols() -> List[str]:
+
+def save_emoji_replacements(data) -> bool:
+    """Save emoji replacements to JSON file"""
+    try:
+        config.write(EMOJI_FILE, data, ensure_ascii=False, indent=2)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save emoji replacements: {e}")
+        return False
+
+def load_preserve_symbols() -> Tuple[str, ...]:
     """Load symbols to preserve during emoji removal"""
     try:
-        if not os.path.exists(SYMBOL_FILE):
-            return []
-        with open(SYMBOL_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return config.get(SYMBOL_FILE, _read_json_list)
     except Exception as e:
         logger.error(f"Failed to load preserve symbols: {e}")
         return []
-    
-def get_admin_ids():
-    """Get list of admin user IDs from environment"""
-    admin_ids = os.getenv('ADMIN_IDS', '').split(',')
-    return [int(id.strip()) for id in admin_ids if id.strip().isdigit()]
 
+def save_preserve_symbols(symbols) -> bool:
+    """Save symbols to preserve during emoji removal"""
+    try:
+        config.write(SYMBOL_FILE, symbols, ensure_ascii=False, indent=2)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save preserve symbols: {e}")
+        return False
+    
 def get_source_id():
     return int(os.getenv("API_ID"))
 